@@ -1,50 +1,778 @@
+import contextlib
+import asyncio
+import hashlib
 import json
 import os
+import pickle
+import random
+import sqlite3
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import boto3
+from botocore.config import Config
 import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFDirectoryLoader
+from langchain_community.document_loaders import PyPDFDirectoryLoader, PyPDFLoader
 from langchain.prompts import PromptTemplate
 from langchain.chains import RetrievalQA
 
 ## OpenSearch Client
 from opensearchpy import OpenSearch
+from opensearchpy.exceptions import ConnectionError as OpenSearchConnectionError, TransportError
 
 ## LangChain OpenSearch Integration
 from langchain.vectorstores import OpenSearchVectorSearch
+from langchain.vectorstores.base import VectorStore
+from langchain.schema import Document
 
 ## AWS Bedrock Clients
-from langchain_community.embeddings import BedrockEmbeddings
 from langchain.llms.bedrock import Bedrock
 
 # Initialize OpenSearch
 OPENSEARCH_HOST = "https://your-opensearch-domain"  # Change to your OpenSearch endpoint
 INDEX_NAME = "pdf_embeddings"  # Change if needed
+DATA_DIR = "data"
+MANIFEST_PATH = ".ingest_manifest.json"  # Per-file and per-chunk hashes of what is indexed
+# Small chunks are over-fetched and packed into the prompt (see pack_context)
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v1"
+EMBEDDING_CACHE_PATH = ".embedding_cache.sqlite"
+EMBEDDING_DIMS = 1536  # amazon.titan-embed-text-v1
+# Set to an HTTP embedding endpoint (e.g. fake_rag_server.py) instead of calling Bedrock
+EMBEDDING_ENDPOINT = os.environ.get("EMBEDDING_ENDPOINT")
+BULK_THREADS = 4  # Concurrent _bulk requests
+BULK_CHUNK_DOCS = 200  # Docs per _bulk request (~6 MB with 1536-dim vectors)
+BULK_RETRY_STATUS = {429, 502, 503, 504}  # Whole _bulk requests worth sending again
+# "opensearch", or "local" for the in-process LocalVectorStore (offline, single node)
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "opensearch")
+LOCAL_INDEX_DIR = ".vector_index"
+BEDROCK_POOL_CONNECTIONS = 32  # Enough for the concurrent embedding requests plus LLM calls
+ANSWER_CACHE_SIZE = 1000
+ANSWER_CACHE_TTL = 24 * 3600  # Seconds before a cached answer is regenerated
+SEMANTIC_THRESHOLD = 0.95  # Cosine similarity for two questions to share an answer
+# Set to a streaming generation endpoint (e.g. fake_rag_server.py /generate) instead of calling Bedrock
+LLM_ENDPOINT = os.environ.get("LLM_ENDPOINT")
+FETCH_K = 20  # Candidate chunks fetched per question before reranking
+CONTEXT_TOKEN_BUDGET = 1500  # Tokens of retrieved evidence sent to the LLM
+MMR_LAMBDA = 0.5  # LangChain's MMR default; 1.0 ranks purely by relevance
+CHARS_PER_TOKEN = 4
 
 opensearch_client = OpenSearch(
     hosts=[OPENSEARCH_HOST],
     http_auth=("admin", "admin"),  # Change credentials
     use_ssl=True,
     verify_certs=False,
+    pool_maxsize=BULK_THREADS * 2,  # Keep connections open for parallel bulk requests
 )
 
+## Embedding client
+class ThrottledError(Exception):
+    """Raised by an embedding transport when the service asks us to slow down"""
+
+
+THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException"}
+
+
+# Transports raise ThrottledError, or the builtin ConnectionError/TimeoutError for
+# their own network failures, so BatchedEmbeddings can retry them all alike
+def bedrock_embed_batch(client, model_id):
+    """Transport for Bedrock: Titan embeds one text per invoke_model call"""
+    from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+    def embed_batch(texts):
+        vectors = []
+        for text in texts:
+            try:
+                response = client.invoke_model(modelId=model_id, body=json.dumps({"inputText": text}),
+                                               accept="application/json", contentType="application/json")
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in THROTTLE_CODES:
+                    raise ThrottledError(str(e)) from e
+                raise
+            except (EndpointConnectionError, ConnectTimeoutError) as e:
+                raise ConnectionError(str(e)) from e
+            except ReadTimeoutError as e:
+                raise TimeoutError(str(e)) from e
+            vectors.append(json.loads(response["body"].read())["embedding"])
+        return vectors
+
+    return embed_batch
+
+
+def http_embed_batch(url, model_id, timeout=60):
+    """Transport for an HTTP endpoint taking {"model", "texts"} and returning {"embeddings"}"""
+    import urllib.error
+    import urllib.request
+
+    def embed_batch(texts):
+        request = urllib.request.Request(url, data=json.dumps({"model": model_id, "texts": texts}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())["embeddings"]
+        except urllib.error.HTTPError as e:
+            if e.code in (429, 503):
+                raise ThrottledError(f"HTTP {e.code}") from e
+            raise
+        except urllib.error.URLError as e:
+            # Refused connections and connect timeouts arrive wrapped in URLError
+            if isinstance(e.reason, TimeoutError):
+                raise TimeoutError(str(e.reason)) from e
+            raise ConnectionError(str(e.reason)) from e
+
+    return embed_batch
+
+
+class EmbeddingCache:
+    """SQLite cache of float32 embeddings keyed by (model id, text sha256)"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily so forked ingestion workers never share the connection
+        if self.conn is None:
+            # Shared across the async service's threads; self.lock serialises access
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings "
+                              "(model_id TEXT, text_hash TEXT, vector BLOB, PRIMARY KEY (model_id, text_hash))")
+        return self.conn
+
+    def get_many(self, model_id, hashes):
+        found = {}
+        with self.lock:
+            conn = self._connect()
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                rows = conn.execute(f"SELECT text_hash, vector FROM embeddings WHERE model_id = ? AND text_hash IN "
+                                    f"({','.join('?' * len(batch))})", [model_id, *batch])
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model_id, items):
+        with self.lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                             [(model_id, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                              for text_hash, vector in items])
+            conn.commit()
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on throttling and creeps back up on success (AIMD)"""
+
+    def __init__(self, max_concurrency, min_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self.cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+
+class BatchedEmbeddings:
+    """Drop-in for BedrockEmbeddings that batches texts, embeds them concurrently and caches the vectors.
+
+    embed_batch(texts) -> vectors is the transport; it raises ThrottledError
+    when the service pushes back, which halves the concurrency and retries
+    the batch with exponential backoff.
+    """
+
+    def __init__(self, embed_batch, model_id, cache=None, batch_size=8, max_concurrency=16, max_retries=5,
+                 backoff=0.5):
+        self.embed_batch = embed_batch
+        self.model_id = model_id
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.stats = {"texts": 0, "cache_hits": 0, "requests": 0, "throttled": 0, "retries": 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self.stats_lock:
+            self.stats[key] += n
+
+    def _embed_with_retry(self, texts):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            throttled = False
+            try:
+                self._count("requests")
+                return self.embed_batch(texts)
+            except (ThrottledError, ConnectionError, TimeoutError) as e:
+                throttled = isinstance(e, ThrottledError)
+                self._count("throttled", throttled)
+                if attempt == self.max_retries:
+                    raise
+                self._count("retries")
+            finally:
+                self.limiter.release(throttled)
+            time.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def embed_documents(self, texts):
+        self._count("texts", len(texts))
+        hashes = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+        vectors = self.cache.get_many(self.model_id, list(set(hashes))) if self.cache else {}
+        self._count("cache_hits", sum(text_hash in vectors for text_hash in hashes))
+
+        # Embed each distinct uncached text once, batch_size texts per request
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+        missing_hashes = list(missing)
+        futures = {}
+        for start in range(0, len(missing_hashes), self.batch_size):
+            batch = missing_hashes[start:start + self.batch_size]
+            futures[self.executor.submit(self._embed_with_retry, [missing[h] for h in batch])] = batch
+        for future in as_completed(futures):
+            embedded = list(zip(futures[future], future.result()))
+            vectors.update(embedded)
+            if self.cache:
+                self.cache.put_many(self.model_id, embedded)
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
 # Initialize AWS Bedrock
-bedrock = boto3.client(service_name="bedrock-runtime")
-bedrock_embeddings = BedrockEmbeddings(model_id="amazon.titan-embed-text-v1", client=bedrock)
+bedrock = boto3.client(service_name="bedrock-runtime", config=Config(max_pool_connections=BEDROCK_POOL_CONNECTIONS))
+bedrock_embeddings = BatchedEmbeddings(
+    http_embed_batch(EMBEDDING_ENDPOINT, EMBEDDING_MODEL_ID) if EMBEDDING_ENDPOINT
+    else bedrock_embed_batch(bedrock, EMBEDDING_MODEL_ID),
+    EMBEDDING_MODEL_ID,
+    cache=EmbeddingCache(EMBEDDING_CACHE_PATH),
+)
 
 
 ## Data ingestion
 def data_ingestion():
-    loader = PyPDFDirectoryLoader("data")
+    loader = PyPDFDirectoryLoader(DATA_DIR)
     documents = loader.load()
 
     # Character split works better for PDF data
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
     docs = text_splitter.split_documents(documents)
     return docs
 
 
+def load_and_split_pdf(path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Load one PDF and split it into chunks (runs in a worker process)"""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return text_splitter.split_documents(PyPDFLoader(path).load())
+
+
+def list_pdfs(data_dir=DATA_DIR):
+    """All PDFs under data_dir, relative to it, in a stable order"""
+    paths = []
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                paths.append(os.path.relpath(os.path.join(root, name), data_dir))
+    return sorted(paths)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(name, chunks):
+    """Content-addressed chunk ids: unchanged chunks keep their id across edits"""
+    ids, seen = [], {}
+    for chunk in chunks:
+        content = chunk.page_content + json.dumps(chunk.metadata, sort_keys=True, default=str)
+        chunk_id = f"{name}:{hashlib.sha256(content.encode()).hexdigest()[:16]}"
+        # Identical chunks within one file still need distinct ids
+        seen[chunk_id] = seen.get(chunk_id, -1) + 1
+        ids.append(chunk_id if seen[chunk_id] == 0 else f"{chunk_id}-{seen[chunk_id]}")
+    return ids
+
+
+class IngestionManifest:
+    """What is in the index: per file its signature, content hash and chunk ids.
+
+    Saved after every file, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.files = json.load(f)
+
+    def matches_signature(self, name, signature):
+        entry = self.files.get(name)
+        return entry is not None and {k: entry.get(k) for k in signature} == signature
+
+    def matches_hash(self, name, sha256, chunking):
+        # Same bytes split with different settings still needs re-chunking
+        entry = self.files.get(name)
+        return entry is not None and entry["sha256"] == sha256 and entry.get("chunking") == chunking
+
+    def chunk_ids(self, name):
+        return self.files.get(name, {}).get("chunks", [])
+
+    def record(self, name, signature, sha256, ids):
+        self.files[name] = {**signature, "sha256": sha256, "chunks": ids}
+        self.save()
+
+    def remove(self, name):
+        self.files.pop(name, None)
+        self.save()
+
+    def save(self):
+        # Write then rename, so a crash never leaves a truncated manifest
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.files, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class LocalVectorStore(VectorStore):
+    """In-process vector store: a memory-mapped float32 matrix plus a JSONL sidecar.
+
+    vectors.f32 holds one L2-normalised row per chunk; docs.jsonl is an
+    append-only log of {"id", "text", "metadata"} rows and {"delete": id}
+    tombstones, replayed on open. Search is exact cosine top-k over the
+    mapped matrix, done in blocks so memory stays bounded for big stores.
+    Opening also repairs what a crashed writer left behind, so it assumes no
+    other process is writing at the same time.
+    """
+
+    search_block_rows = 262144
+
+    def __init__(self, path=LOCAL_INDEX_DIR, embedding=None):
+        self.path = path
+        self.embedding = embedding or bedrock_embeddings
+        self.dims = None
+        self.ids, self.texts, self.metadatas = [], [], []
+        self.row_of = {}  # live id -> row
+        self.alive = []
+        self.arrays = None  # (memory-mapped matrix, alive mask), rebuilt after writes
+        os.makedirs(path, exist_ok=True)
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.docs_path = os.path.join(path, "docs.jsonl")
+        self._replay()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def _replay(self):
+        committed = 0
+        if os.path.exists(self.docs_path):
+            with open(self.docs_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # Torn final line from a crash mid-append
+                    entry = json.loads(line)
+                    if "delete" in entry:
+                        self._tombstone(entry["delete"])
+                    else:
+                        self.dims = entry.get("dims", self.dims)
+                        self._append_row(entry["id"], entry["text"], entry["metadata"])
+                    committed += len(line)
+            if committed < os.path.getsize(self.docs_path):
+                with open(self.docs_path, "r+b") as f:
+                    f.truncate(committed)
+
+        # Row n of vectors.f32 must be docs row n: cut orphan vectors written before a
+        # crash kept their docs from being logged, and zero-fill rows whose vectors
+        # never reached disk, tombstoning them so they are not searched
+        row_bytes = 4 * self.dims if self.dims else 0
+        vector_bytes = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        rows_on_disk = vector_bytes // row_bytes if row_bytes else 0
+        lost = [self.ids[row] for row in range(rows_on_disk, len(self.ids)) if self.alive[row]]
+        if vector_bytes != len(self.ids) * row_bytes:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(len(self.ids) * row_bytes)
+        if lost:
+            self.delete(ids=lost)
+
+    def _append_row(self, doc_id, text, metadata):
+        self._tombstone(doc_id)
+        self.row_of[doc_id] = len(self.ids)
+        self.ids.append(doc_id)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+        self.alive.append(True)
+
+    def _tombstone(self, doc_id):
+        row = self.row_of.pop(doc_id, None)
+        if row is not None:
+            self.alive[row] = False
+
+    def _arrays(self):
+        if self.arrays is None and self.dims and len(self.ids):
+            # Map only whole rows actually on disk; np.memmap refuses a shape past the end
+            rows = min(len(self.ids), os.path.getsize(self.vectors_path) // (4 * self.dims))
+            if rows:
+                matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dims))
+                self.arrays = (matrix, np.array(self.alive[:rows], dtype=bool))
+        return self.arrays
+
+    def add_embeddings(self, texts, vectors, metadatas=None, ids=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.dims is None:
+            self.dims = vectors.shape[1]
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [hashlib.sha256(text.encode()).hexdigest()[:16] for text in texts]
+        # Vectors first: a row only counts once its vector is on disk
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.docs_path, "a") as f:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                f.write(json.dumps({"id": doc_id, "text": text, "metadata": metadata, "dims": self.dims},
+                                   default=str) + "\n")
+                self._append_row(doc_id, text, metadata)
+        self.arrays = None
+        return list(ids)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        with open(self.docs_path, "a") as f:
+            for doc_id in ids or []:
+                if doc_id in self.row_of:
+                    f.write(json.dumps({"delete": doc_id}) + "\n")
+                    self._tombstone(doc_id)
+        self.arrays = None
+        return True
+
+    def batch_search_by_vector(self, vectors, k=4):
+        """Top-k (row, score) lists for each query vector, in one pass over the matrix"""
+        arrays = self._arrays()
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        if arrays is None:
+            return [[] for _ in queries]
+        matrix, alive = arrays
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(matrix), self.search_block_rows):
+            block = slice(start, min(start + self.search_block_rows, len(matrix)))
+            scores = queries @ matrix[block].T
+            scores[:, ~alive[block]] = -np.inf
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(block.start, block.stop),
+                                                               (len(queries), block.stop - block.start))], axis=1)
+            top = np.argpartition(-scores, min(k, scores.shape[1]) - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+        results = []
+        for rows, scores in zip(best_rows, best_scores):
+            order = np.argsort(-scores)
+            results.append([(int(rows[i]), float(scores[i])) for i in order if scores[i] > -np.inf])
+        return results
+
+    def _document(self, row):
+        return Document(page_content=self.texts[row], metadata={**self.metadatas[row], "id": self.ids[row]})
+
+    def batch_similarity_search(self, queries, k=4):
+        """Documents for many questions at once: one embedding batch, one matrix pass"""
+        hits = self.batch_search_by_vector(self.embedding.embed_documents(list(queries)), k)
+        return [[self._document(row) for row, _ in query_hits] for query_hits in hits]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [self._document(row) for row, _ in self.batch_search_by_vector([embedding], k)[0]]
+
+    def similarity_search_with_vectors(self, embedding, k=4):
+        """Top-k documents plus their stored (normalised) vectors"""
+        rows = [row for row, _ in self.batch_search_by_vector([embedding], k)[0]]
+        if not rows:
+            return [], np.zeros((0, self.dims or 0), dtype=np.float32)
+        return [self._document(row) for row in rows], np.asarray(self._arrays()[0][rows])
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        hits = self.batch_search_by_vector([self.embedding.embed_query(query)], k)[0]
+        return [(self._document(row), score) for row, score in hits]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, path=LOCAL_INDEX_DIR, **kwargs):
+        store = cls(path, embedding)
+        store.add_texts(texts, metadatas, kwargs.get("ids"))
+        return store
+
+
+def get_vector_store():
+    """The store questions are answered from, picked by VECTOR_BACKEND"""
+    if VECTOR_BACKEND == "local":
+        return LocalVectorStore(LOCAL_INDEX_DIR, bedrock_embeddings)
+    return OpenSearchVectorSearch(
+        embedding_function=bedrock_embeddings,
+        opensearch_url=OPENSEARCH_HOST,
+        index_name=INDEX_NAME,
+    )
+
+
+def search_with_vectors(vector_store, query_vector, k):
+    """Top-k documents and the vectors stored with them, so reranking never re-embeds chunk text"""
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.similarity_search_with_vectors(query_vector, k)
+    # Same approximate k-NN query OpenSearchVectorSearch sends, keeping vector_field in the hits
+    response = vector_store.client.search(index=vector_store.index_name, body={
+        "size": k,
+        "query": {"knn": {"vector_field": {"vector": list(query_vector), "k": k}}},
+        "_source": ["text", "metadata", "vector_field"],
+    })
+    hits = [hit["_source"] for hit in response["hits"]["hits"]]
+    docs = [Document(page_content=hit["text"], metadata=hit.get("metadata") or {}) for hit in hits]
+    return docs, [hit["vector_field"] for hit in hits]
+
+
+def vector_index_body(dims, replicas=1):
+    """Index definition matching the fields OpenSearchVectorSearch reads"""
+    return {
+        "settings": {"index": {"knn": True, "number_of_replicas": replicas, "refresh_interval": "1s"}},
+        "mappings": {
+            "properties": {
+                "vector_field": {
+                    "type": "knn_vector",
+                    "dimension": dims,
+                    "method": {"name": "hnsw", "space_type": "l2", "engine": "nmslib"},
+                },
+                "text": {"type": "text"},
+                "metadata": {"type": "object"},
+            }
+        },
+    }
+
+
+class BulkIndexer:
+    """Parallel _bulk loader for the vector index over the shared, pooled client.
+
+    Has the add_documents/delete methods ingest_pdfs needs, so it replaces
+    the LangChain vector store for writes. Items rejected with 429 (full
+    write queue) are retried with backoff, and so is a whole request refused
+    with 429/5xx or lost to a connection error; stats counts docs and rejections.
+    """
+
+    def __init__(self, client=None, index_name=INDEX_NAME, embeddings=None, dims=EMBEDDING_DIMS,
+                 thread_count=BULK_THREADS, chunk_docs=BULK_CHUNK_DOCS, max_retries=3, backoff=1.0):
+        self.client = client or opensearch_client
+        self.index_name = index_name
+        self.embeddings = embeddings or bedrock_embeddings
+        self.dims = dims
+        self.thread_count = thread_count
+        self.chunk_docs = chunk_docs
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=thread_count)
+        self.index_ready = False
+        self.stats = {"indexed": 0, "deleted": 0, "rejected": 0, "failed": 0, "seconds": 0.0}
+
+    def ensure_index(self):
+        if not self.index_ready:
+            if not self.client.indices.exists(index=self.index_name):
+                self.client.indices.create(index=self.index_name, body=vector_index_body(self.dims))
+            self.index_ready = True
+
+    @contextlib.contextmanager
+    def bulk_load(self):
+        """Turn off refresh and replicas for the duration of a load, then restore them"""
+        self.ensure_index()
+        settings = self.client.indices.get_settings(index=self.index_name)[self.index_name]["settings"]["index"]
+        restore = {"refresh_interval": settings.get("refresh_interval", "1s"),
+                   "number_of_replicas": settings.get("number_of_replicas", 1)}
+        self.client.indices.put_settings(index=self.index_name,
+                                         body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.client.indices.put_settings(index=self.index_name, body={"index": restore})
+            self.client.indices.refresh(index=self.index_name)
+            self.stats["seconds"] += time.perf_counter() - started
+
+    def _send(self, actions):
+        """One _bulk request; returns the actions to retry and counts the rest"""
+        body = []
+        for action in actions:
+            body.append({action["op"]: {"_index": self.index_name, "_id": action["id"]}})
+            if action["op"] == "index":
+                body.append(action["source"])
+        try:
+            response = self.client.bulk(body=body)
+        except TransportError as e:
+            # opensearch-py raises ConnectionError (a TransportError) with no HTTP status
+            if not isinstance(e, OpenSearchConnectionError) and e.status_code not in BULK_RETRY_STATUS:
+                raise
+            return list(actions), {"ok": 0, "rejected": len(actions), "failed": 0}
+        retry, counts = [], {"ok": 0, "rejected": 0, "failed": 0}
+        for action, item in zip(actions, response["items"]):
+            status = item[action["op"]].get("status", 500)
+            if status < 300 or (action["op"] == "delete" and status == 404):
+                counts["ok"] += 1
+            elif status == 429:
+                counts["rejected"] += 1
+                retry.append(action)
+            else:
+                counts["failed"] += 1
+        return retry, counts
+
+    def _run(self, actions, ok_key):
+        pending = actions
+        for attempt in range(self.max_retries + 1):
+            chunks = [pending[start:start + self.chunk_docs] for start in range(0, len(pending), self.chunk_docs)]
+            pending = []
+            for retry, counts in self.executor.map(self._send, chunks):
+                pending.extend(retry)
+                self.stats[ok_key] += counts["ok"]
+                self.stats["rejected"] += counts["rejected"]
+                self.stats["failed"] += counts["failed"]
+            if not pending:
+                return
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        self.stats["failed"] += len(pending)
+        raise RuntimeError(f"{len(pending)} bulk item(s) still rejected after {self.max_retries} retries")
+
+    def add_documents(self, docs, ids):
+        self.ensure_index()
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in docs])
+        self._run([{"op": "index", "id": doc_id,
+                    "source": {"vector_field": vector, "text": doc.page_content, "metadata": doc.metadata}}
+                   for doc_id, doc, vector in zip(ids, docs, vectors)], "indexed")
+        return ids
+
+    def delete(self, ids):
+        self._run([{"op": "delete", "id": doc_id} for doc_id in ids], "deleted")
+        return True
+
+    def report(self):
+        seconds = self.stats["seconds"] or float("nan")
+        return (f"{self.stats['indexed']} docs indexed, {self.stats['deleted']} deleted in {self.stats['seconds']:.1f}s "
+                f"({self.stats['indexed'] / seconds:.0f} docs/sec), {self.stats['rejected']} rejected, "
+                f"{self.stats['failed']} failed")
+
+
+def sync_file_chunks(vector_store, old_ids, ids, chunks):
+    """Embed only chunks whose id is new and delete the ids that disappeared"""
+    old = set(old_ids)
+    new_chunks = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in old]
+    if new_chunks:
+        vector_store.add_documents([chunk for _, chunk in new_chunks], ids=[chunk_id for chunk_id, _ in new_chunks])
+    removed = sorted(old - set(ids))
+    if removed:
+        vector_store.delete(ids=removed)
+    return len(new_chunks), len(removed)
+
+
+def ingest_pdfs(data_dir=DATA_DIR, manifest_path=None, max_workers=None, vector_store=None,
+                chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Incrementally sync the PDFs in data_dir into the vector store.
+
+    Files whose size and mtime (or, failing that, content hash) match the
+    manifest are skipped; so are files already split with the same chunk
+    settings. Changed files are split in a process pool and only
+    their new chunks are embedded; chunks and files that disappeared are
+    deleted from the index. Returns counts of the work done.
+    """
+    if manifest_path is None:
+        # Each backend tracks what it holds, so switching backends re-ingests everything
+        manifest_path = os.path.join(LOCAL_INDEX_DIR, "manifest.json") if VECTOR_BACKEND == "local" else MANIFEST_PATH
+    manifest = IngestionManifest(manifest_path)
+    if vector_store is None:
+        vector_store = get_vector_store() if VECTOR_BACKEND == "local" else BulkIndexer()
+    stats = {"files": 0, "unchanged": 0, "added": 0, "deleted": 0, "failed": []}
+
+    names = list_pdfs(data_dir)
+    pending = {}
+    for name in names:
+        path = os.path.join(data_dir, name)
+        signature = {**file_signature(path), "chunking": [chunk_size, chunk_overlap]}
+        if manifest.matches_signature(name, signature):
+            stats["unchanged"] += 1
+            continue
+        sha256 = file_sha256(path)
+        if manifest.matches_hash(name, sha256, signature["chunking"]):
+            # Touched but not modified: refresh the signature, nothing to embed
+            manifest.record(name, signature, sha256, manifest.chunk_ids(name))
+            stats["unchanged"] += 1
+            continue
+        pending[name] = (signature, sha256)
+    removed = set(manifest.files) - set(names)
+    print(f"{len(pending)} new or changed PDF(s) to ingest, {len(removed)} removed, {stats['unchanged']} unchanged.")
+    if not pending and not removed:
+        return stats
+
+    # Refresh and replicas stay off only while there is something to write
+    bulk_load = vector_store.bulk_load() if hasattr(vector_store, "bulk_load") else contextlib.nullcontext()
+    with bulk_load:
+        for name in removed:
+            stats["deleted"] += len(manifest.chunk_ids(name))
+            if manifest.chunk_ids(name):
+                vector_store.delete(ids=manifest.chunk_ids(name))
+            manifest.remove(name)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(load_and_split_pdf, os.path.join(data_dir, name), chunk_size, chunk_overlap): name
+                       for name in pending}
+            # Workers keep loading and splitting while finished files are embedded and indexed here
+            for future in as_completed(futures):
+                name = futures[future]
+                signature, sha256 = pending[name]
+                try:
+                    chunks = future.result()
+                    ids = chunk_ids(name, chunks)
+                    added, deleted = sync_file_chunks(vector_store, manifest.chunk_ids(name), ids, chunks)
+                except Exception as e:
+                    print(f"Failed to ingest {name}: {e}")
+                    stats["failed"].append(name)
+                    continue
+                manifest.record(name, signature, sha256, ids)
+                stats["files"] += 1
+                stats["added"] += added
+                stats["deleted"] += deleted
+    if hasattr(vector_store, "report"):
+        print(vector_store.report())
+    return stats
+
+
 ## Store embeddings in OpenSearch
 def store_embeddings_in_opensearch(docs):
     vector_store = OpenSearchVectorSearch.from_documents(
@@ -56,15 +784,24 @@ def store_embeddings_in_opensearch(docs):
     print("Embeddings stored successfully in OpenSearch.")
 
 
+# Bedrock model id and generation parameters per menu choice
+LLM_MODELS = {
+    "claude": ("ai21.j2-mid-v1", {'maxTokens': 512}),
+    "llama2": ("meta.llama2-70b-chat-v1", {'max_gen_len': 512}),
+}
+
+
 def get_claude_llm():
     """Create the Claude model from Bedrock"""
-    llm = Bedrock(model_id="ai21.j2-mid-v1", client=bedrock, model_kwargs={'maxTokens': 512})
+    model_id, model_kwargs = LLM_MODELS["claude"]
+    llm = Bedrock(model_id=model_id, client=bedrock, model_kwargs=model_kwargs)
     return llm
 
 
 def get_llama2_llm():
     """Create the Llama2 model from Bedrock"""
-    llm = Bedrock(model_id="meta.llama2-70b-chat-v1", client=bedrock, model_kwargs={'max_gen_len': 512})
+    model_id, model_kwargs = LLM_MODELS["llama2"]
+    llm = Bedrock(model_id=model_id, client=bedrock, model_kwargs=model_kwargs)
     return llm
 
 
@@ -86,14 +823,10 @@ PROMPT = PromptTemplate(template=prompt_template, input_variables=["context", "q
 
 
 def get_response_llm(llm, query):
-    """Retrieve embeddings from OpenSearch and generate a response."""
+    """Retrieve embeddings from the vector store and generate a response."""
     
-    # Initialize OpenSearch vector store retriever
-    vector_store = OpenSearchVectorSearch(
-        embedding_function=bedrock_embeddings,
-        opensearch_url=OPENSEARCH_HOST,
-        index_name=INDEX_NAME,
-    )
+    # OpenSearch, or the local index when VECTOR_BACKEND=local
+    vector_store = get_vector_store()
     
     retriever = vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 3})
 
@@ -109,35 +842,485 @@ def get_response_llm(llm, query):
     return answer['result']
 
 
+LLM_FACTORIES = {"claude": get_claude_llm, "llama2": get_llama2_llm}
+
+
+def estimate_tokens(text):
+    """Rough token count; close enough for budgeting English prose"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def mmr_order(query_vector, doc_vectors, lambda_mult=MMR_LAMBDA):
+    """Maximal marginal relevance: order docs by relevance minus redundancy with those already picked"""
+    query = np.asarray(query_vector, dtype=np.float32)
+    docs = np.asarray(doc_vectors, dtype=np.float32)
+    query /= max(np.linalg.norm(query), 1e-12)
+    docs /= np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    relevance = docs @ query
+    similarity = docs @ docs.T
+    order = []
+    redundancy = np.zeros(len(docs), dtype=np.float32)  # max similarity to any picked doc, floored at 0
+    remaining = np.ones(len(docs), dtype=bool)
+    for _ in range(len(docs)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        remaining[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return order
+
+
+def pack_context(query_vector, docs, doc_vectors, token_budget=CONTEXT_TOKEN_BUDGET, lambda_mult=MMR_LAMBDA):
+    """Rerank candidates with MMR and keep as many as fit in token_budget, best first"""
+    packed, used = [], 0
+    for i in mmr_order(query_vector, doc_vectors, lambda_mult):
+        tokens = estimate_tokens(docs[i].page_content)
+        # A chunk that doesn't fit is skipped; a smaller, later one may still fit
+        if used + tokens <= token_budget:
+            packed.append(docs[i])
+            used += tokens
+    return packed
+
+
+def normalize_question(question):
+    """Case, whitespace and trailing punctuation don't change the answer"""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+
+class AnswerCache:
+    """Two-level answer cache with TTL and LRU eviction.
+
+    Level 1 matches the normalized question exactly and skips embedding,
+    search and the LLM. Level 2 matches a question whose embedding has at
+    least semantic_threshold cosine similarity with a cached one, but only
+    if the search returned the same chunk ids, so answers never outlive the
+    evidence they were built from. With a path the cache is pickled after
+    every write and survives restarts; a missing or unreadable file starts
+    an empty cache. Writes go to a temporary file that is then renamed over
+    the old one, on a single writer thread, so put(..., wait=False) does not
+    block the caller, and saves queued while one is writing collapse into
+    one write of the latest entries.
+    """
+
+    def __init__(self, path=None, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL,
+                 semantic_threshold=SEMANTIC_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_threshold = semantic_threshold
+        self.entries = OrderedDict()  # (llm, normalized question) -> entry, least recently used first
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stale_chunks": 0, "evictions": 0}
+        self.pending = None  # latest snapshot not yet written
+        self.lock = threading.Lock()  # guards pending
+        self.write_lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    self.entries = pickle.load(f)
+            except Exception as e:
+                # A cache is only an optimisation; a truncated or stale file must not stop the app
+                print(f"Ignoring unreadable answer cache {path}: {e!r}")
+
+    def _expired(self, entry):
+        return time.time() - entry["created"] > self.ttl
+
+    def _save(self, wait=True):
+        if not self.path:
+            return
+        # Entries are replaced, never modified, so a shallow copy is a consistent snapshot
+        with self.lock:
+            queued = self.pending is not None
+            self.pending = OrderedDict(self.entries)
+        if wait:
+            self.writer.submit(self._write_pending).result()
+        elif not queued:
+            self.writer.submit(self._write_pending)
+
+    def _write_pending(self):
+        with self.write_lock:
+            with self.lock:
+                entries, self.pending = self.pending, None
+            if entries is None:
+                return  # an earlier write already picked up the latest snapshot
+            # Write then rename, so a crash never leaves a truncated cache
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entries, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+
+    def get_exact(self, llm_name, question):
+        key = (llm_name, normalize_question(question))
+        entry = self.entries.get(key)
+        if entry is None or self._expired(entry):
+            return None
+        self.entries.move_to_end(key)
+        self.stats["exact_hits"] += 1
+        return entry
+
+    def get_semantic(self, llm_name, query_vector, chunk_ids):
+        """Closest cached question for this LLM; counts a miss when nothing qualifies"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= max(np.linalg.norm(query), 1e-12)
+        candidates = [(key, entry) for key, entry in self.entries.items()
+                      if key[0] == llm_name and not self._expired(entry)]
+        if candidates:
+            scores = np.stack([entry["vector"] for _, entry in candidates]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.semantic_threshold:
+                key, entry = candidates[best]
+                if entry["chunk_ids"] == list(chunk_ids):
+                    self.entries.move_to_end(key)
+                    self.stats["semantic_hits"] += 1
+                    return entry
+                self.stats["stale_chunks"] += 1
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, llm_name, question, query_vector, chunk_ids, answer, wait=True):
+        vector = np.asarray(query_vector, dtype=np.float32)
+        key = (llm_name, normalize_question(question))
+        self.entries[key] = {"answer": answer, "chunk_ids": list(chunk_ids), "created": time.time(),
+                             "vector": vector / max(np.linalg.norm(vector), 1e-12)}
+        self.entries.move_to_end(key)
+        # Expired entries go first, then the least recently used
+        for expired_key in [k for k, entry in self.entries.items() if self._expired(entry)]:
+            del self.entries[expired_key]
+            self.stats["evictions"] += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        self._save(wait)
+
+    def clear(self):
+        """Drop everything, e.g. after the index was re-ingested"""
+        self.entries.clear()
+        self._save()
+
+    def hit_rate(self):
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        return (self.stats["exact_hits"] + self.stats["semantic_hits"]) / lookups if lookups else 0.0
+
+    def report(self):
+        return (f"answer cache: {self.hit_rate():.0%} hit rate ({self.stats['exact_hits']} exact, "
+                f"{self.stats['semantic_hits']} semantic, {self.stats['misses']} misses, "
+                f"{self.stats['stale_chunks']} rejected for changed chunks), {len(self.entries)} entries")
+
+
+class RagSession:
+    """Long-lived question-answering state: vector store, prompt and LLM clients are built once.
+
+    ask() runs the same steps as the "stuff" RetrievalQA chain (embed the
+    question, fetch the top k chunks, fill the prompt, call the LLM) but
+    times each stage, so slow questions can be attributed to embedding,
+    search or generation. Timings are kept for summary(). Answers go
+    through an AnswerCache unless cache=False. With a token_budget, fetch_k
+    candidates are reranked and packed into the budget instead of stuffing
+    the top k (token_budget=None restores plain top-k).
+    """
+
+    def __init__(self, vector_store=None, embeddings=None, prompt=PROMPT, k=3, llms=None, cache=None,
+                 fetch_k=FETCH_K, token_budget=CONTEXT_TOKEN_BUDGET):
+        self.embeddings = embeddings or bedrock_embeddings
+        self.vector_store = vector_store or get_vector_store()
+        self.prompt = prompt
+        self.k = k
+        self.fetch_k = fetch_k
+        self.token_budget = token_budget
+        self.llms = dict(llms or {})
+        self.cache = AnswerCache() if cache is None else cache or None
+        self.timings = []
+
+    def get_llm(self, name):
+        if name not in self.llms:
+            self.llms[name] = LLM_FACTORIES[name]()
+        return self.llms[name]
+
+    def reload_vector_store(self):
+        """Pick up a fresh view of the index, e.g. after ingesting into the local store"""
+        self.vector_store = get_vector_store()
+        if self.cache:
+            self.cache.clear()
+
+    def retrieve(self, question, timing):
+        """Embed the question and fetch its chunks; returns (query vector, docs, chunk ids)"""
+        start = time.perf_counter()
+        query_vector = self.embeddings.embed_query(question)
+        timing["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.token_budget:
+            docs, doc_vectors = search_with_vectors(self.vector_store, query_vector, self.fetch_k)
+        else:
+            docs = self.vector_store.similarity_search_by_vector(query_vector, k=self.k)
+        timing["search"] = time.perf_counter() - start
+
+        if self.token_budget and docs:
+            start = time.perf_counter()
+            docs = pack_context(query_vector, docs, doc_vectors, self.token_budget)
+            timing["rerank"] = time.perf_counter() - start
+
+        # Content hashes identify the evidence the same way for every backend
+        chunk_ids = [hashlib.sha256(doc.page_content.encode()).hexdigest()[:16] for doc in docs]
+        return query_vector, docs, chunk_ids
+
+    def build_prompt(self, question, docs):
+        context = "\n\n".join(doc.page_content for doc in docs)
+        return self.prompt.format(context=context, question=question)
+
+    def ask(self, question, llm_name="llama2"):
+        timing = {}
+        if self.cache:
+            start = time.perf_counter()
+            entry = self.cache.get_exact(llm_name, question)
+            if entry:
+                timing["total"] = time.perf_counter() - start
+                self.timings.append(timing)
+                return {"result": entry["answer"], "source_documents": [], "timing": timing, "cached": "exact"}
+
+        query_vector, docs, chunk_ids = self.retrieve(question, timing)
+        if self.cache:
+            entry = self.cache.get_semantic(llm_name, query_vector, chunk_ids)
+            if entry:
+                timing["total"] = sum(timing.values())
+                self.timings.append(timing)
+                return {"result": entry["answer"], "source_documents": docs, "timing": timing, "cached": "semantic"}
+
+        start = time.perf_counter()
+        answer = self.get_llm(llm_name).invoke(self.build_prompt(question, docs))
+        timing["llm"] = time.perf_counter() - start
+
+        timing["total"] = sum(timing.values())
+        self.timings.append(timing)
+        if self.cache:
+            self.cache.put(llm_name, question, query_vector, chunk_ids, answer)
+        return {"result": answer, "source_documents": docs, "timing": timing, "cached": None}
+
+    def summary(self):
+        """Mean and p95 seconds per stage over the questions asked so far"""
+        if not self.timings:
+            return "No questions timed yet."
+        lines = []
+        for stage in ["embed", "search", "rerank", "ttft", "llm", "total"]:
+            # Cache hits skip the later stages, so each stage is averaged over the questions that ran it
+            values = np.array([timing[stage] for timing in self.timings if stage in timing])
+            if not len(values):
+                continue
+            lines.append(f"{stage:>6}: mean {values.mean() * 1000:.1f} ms, p95 {np.percentile(values, 95) * 1000:.1f} ms")
+        if self.cache:
+            lines.append(self.cache.report())
+        return f"{len(self.timings)} question(s)\n" + "\n".join(lines)
+
+
+def format_timing(timing):
+    return ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timing.items())
+
+
+def bedrock_stream_tokens(client):
+    """Token streamer over Bedrock's response stream (Llama2); AI21 models don't stream, so they yield once"""
+
+    def stream(model_id, prompt, params):
+        body = json.dumps({"prompt": prompt, **params})
+        if model_id.startswith("ai21."):
+            response = client.invoke_model(modelId=model_id, body=body)
+            yield json.loads(response["body"].read())["completions"][0]["data"]["text"]
+            return
+        response = client.invoke_model_with_response_stream(modelId=model_id, body=body)
+        for event in response["body"]:
+            chunk = json.loads(event["chunk"]["bytes"])
+            if chunk.get("generation"):
+                yield chunk["generation"]
+
+    return stream
+
+
+def http_stream_tokens(url, timeout=120):
+    """Token streamer for an endpoint that answers {"model", "prompt", ...} with NDJSON {"generation"} lines"""
+    import urllib.request
+
+    def stream(model_id, prompt, params):
+        request = urllib.request.Request(url, data=json.dumps({"model": model_id, "prompt": prompt, **params}).encode(),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)["generation"]
+
+    return stream
+
+
+class AsyncRagService:
+    """Serves many questions concurrently over one RagSession, streaming answer tokens.
+
+    Blocking work (query embedding, search, the LLM token stream) runs on a
+    shared thread pool; tokens are handed to the event loop as they arrive.
+    At most max_concurrency questions are in flight. Every answer records
+    its time to first token, so report() can give TTFT percentiles and
+    answers/sec; the per-stage timings also go to the session's summary().
+    """
+
+    def __init__(self, session=None, stream_tokens=None, max_concurrency=8):
+        self.session = session or RagSession()
+        if stream_tokens is None:
+            stream_tokens = http_stream_tokens(LLM_ENDPOINT) if LLM_ENDPOINT else bedrock_stream_tokens(bedrock)
+        self.stream_tokens = stream_tokens
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.semaphores = {}  # one per event loop, since the CLI runs each request in its own
+        self.metrics = []
+
+    async def _iterate_in_thread(self, make_iterator):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+
+        def produce():
+            try:
+                for item in make_iterator():
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        producer = loop.run_in_executor(self.executor, produce)
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+
+    async def ask_stream(self, question, llm_name="llama2"):
+        """Yield the answer's tokens as the model produces them"""
+        loop = asyncio.get_running_loop()
+        if loop not in self.semaphores:
+            self.semaphores = {loop: asyncio.Semaphore(self.max_concurrency)}
+        async with self.semaphores[loop]:
+            start = time.perf_counter()
+            metric = {"ttft": None, "total": None, "tokens": 0, "cached": None}
+            timing = {}
+            cache = self.session.cache
+            entry = cache.get_exact(llm_name, question) if cache else None
+            if entry:
+                metric["cached"] = "exact"
+            else:
+                query_vector, docs, chunk_ids = await loop.run_in_executor(
+                    self.executor, self.session.retrieve, question, timing)
+                entry = cache.get_semantic(llm_name, query_vector, chunk_ids) if cache else None
+                if entry:
+                    metric["cached"] = "semantic"
+
+            if entry:
+                metric["ttft"] = time.perf_counter() - start
+                metric["tokens"] = 1
+                yield entry["answer"]
+            else:
+                model_id, params = LLM_MODELS[llm_name]
+                prompt = self.session.build_prompt(question, docs)
+                tokens = []
+                llm_start = time.perf_counter()
+                async for token in self._iterate_in_thread(lambda: self.stream_tokens(model_id, prompt, params)):
+                    if metric["ttft"] is None:
+                        metric["ttft"] = time.perf_counter() - start
+                    tokens.append(token)
+                    yield token
+                timing["llm"] = time.perf_counter() - llm_start
+                metric["tokens"] = len(tokens)
+                if cache:
+                    # Pickling the whole cache would stall the event loop; it is written on the cache's thread
+                    cache.put(llm_name, question, query_vector, chunk_ids, "".join(tokens), wait=False)
+            metric["total"] = time.perf_counter() - start
+            self.metrics.append(metric)
+            if metric["ttft"] is not None:
+                timing["ttft"] = metric["ttft"]
+            timing["total"] = metric["total"]
+            self.session.timings.append(timing)
+
+    async def ask(self, question, llm_name="llama2"):
+        return "".join([token async for token in self.ask_stream(question, llm_name)])
+
+    async def ask_many(self, questions, llm_name="llama2"):
+        """Answer all questions concurrently; answers come back in question order"""
+        start = time.perf_counter()
+        answers = await asyncio.gather(*(self.ask(question, llm_name) for question in questions))
+        elapsed = time.perf_counter() - start
+        return answers, (len(questions) / elapsed if elapsed else float("inf"))
+
+    def report(self):
+        answered = [metric for metric in self.metrics if metric["ttft"] is not None]
+        if not answered:
+            return "No answers streamed yet."
+        ttft = np.array([metric["ttft"] for metric in answered]) * 1000
+        total = np.array([metric["total"] for metric in answered]) * 1000
+        cached = sum(metric["cached"] is not None for metric in answered)
+        return (f"{len(answered)} answer(s), {cached} from cache; time to first token p50 "
+                f"{np.percentile(ttft, 50):.0f} ms, p95 {np.percentile(ttft, 95):.0f} ms; "
+                f"full answer p50 {np.percentile(total, 50):.0f} ms")
+
+
+async def stream_answer_to_console(service, question, llm_name):
+    start = time.perf_counter()
+    async for token in service.ask_stream(question, llm_name):
+        print(token, end="", flush=True)
+    # An empty answer never produces a first token
+    ttft = service.metrics[-1]["ttft"]
+    first_token = f"{ttft * 1000:.0f} ms" if ttft is not None else "n/a"
+    print(f"\n\n[first token after {first_token}, "
+          f"answer in {(time.perf_counter() - start) * 1000:.0f} ms]")
+
+
 def main():
+    # Clients, vector store and prompt are built once and reused for every question
+    session = RagSession()
+    service = AsyncRagService(session)
     while True:
         print("\nOptions:")
         print("1. Update/Create Vector Store in OpenSearch")
         print("2. Get Claude Output")
-        print("3. Get Llama2 Output")
-        print("4. Exit")
+        print("3. Get Llama2 Output (streamed)")
+        print("4. Ask several Llama2 questions concurrently")
+        print("5. Exit")
 
         choice = input("Enter your choice: ")
 
         if choice == "1":
             print("Processing data ingestion and OpenSearch vector store update...")
-            docs = data_ingestion()
-            store_embeddings_in_opensearch(docs)
-            print("Vector store updated successfully in OpenSearch!")
+            stats = ingest_pdfs()
+            print(f"Embedded {stats['added']} new chunk(s) from {stats['files']} file(s), "
+                  f"deleted {stats['deleted']} stale chunk(s).")
+            if stats["failed"]:
+                print(f"{len(stats['failed'])} file(s) failed, run again to retry them: {', '.join(stats['failed'])}")
+            else:
+                print("Vector store updated successfully in OpenSearch!")
+            session.reload_vector_store()
 
         elif choice == "2":
             user_question = input("\nEnter your question: ")
-            llm = get_claude_llm()
+            answer = session.ask(user_question, "claude")
             print("\nClaude Output:\n")
-            print(get_response_llm(llm, user_question))
+            print(answer["result"])
+            print(f"\n[{format_timing(answer['timing'])}]")
 
         elif choice == "3":
             user_question = input("\nEnter your question: ")
-            llm = get_llama2_llm()
             print("\nLlama2 Output:\n")
-            print(get_response_llm(llm, user_question))
+            asyncio.run(stream_answer_to_console(service, user_question, "llama2"))
 
         elif choice == "4":
+            questions = []
+            while question := input("Question (empty line to start): ").strip():
+                questions.append(question)
+            answers, answers_per_sec = asyncio.run(service.ask_many(questions, "llama2"))
+            for question, answer in zip(questions, answers):
+                print(f"\nQ: {question}\n{answer}")
+            print(f"\n[{len(answers)} answer(s) at {answers_per_sec:.2f} answers/sec]")
+
+        elif choice == "5":
+            print(session.summary())
+            print(service.report())
             print("Exiting...")
             break
 
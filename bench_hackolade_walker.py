@@ -0,0 +1,186 @@
+import argparse
+import gc
+import hashlib
+import random
+import sys
+import time
+
+from file1_4 import VENDOR_RULES, sort_entity_dict, walk_attributes
+
+# Checks that walk_attributes is a drop-in replacement for the recursive
+# processors it retired: same output rows, throughput within noise (the md5
+# hash_key and col_desc per node dominate both, so the walker is not faster),
+# and no RecursionError on deeply nested documents.
+
+# Recursive processors as they were before the explicit-stack walker, kept
+# here only as the baseline for the parity check
+class LegacyOracleAttributeProcessor:
+    def __init__(self, properties, hier, element_dict):
+        self.properties = properties
+        self.hier = hier
+        self.element_dict = element_dict
+        self.cntr = 0
+
+    def fetch_attributes(self):
+        for idx, block in enumerate(self.properties):
+            col_desc = {}
+            if 'type' in block:
+                self.cntr += 1
+                data_type = block['type']
+
+                attribute_hierarchy = f"{self.hier}.{block.get('code', block.get('name', ''))}"
+                hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
+
+                if hash_str not in self.element_dict:
+                    col_desc['description'] = block.get('description', '')
+                    col_desc['active_indicator'] = block.get('isActivated', '')
+                    col_desc['data_type_name'] = data_type
+                    self.element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, self.cntr, col_desc]
+
+                if 'properties' in block:
+                    LegacyOracleAttributeProcessor(block['properties'], attribute_hierarchy, self.element_dict).fetch_attributes()
+
+class LegacyPostgreSQLAttributeProcessor(LegacyOracleAttributeProcessor):
+    def fetch_attributes(self):
+        for idx, block in enumerate(self.properties):
+            col_desc = {}
+            if 'type' in block:
+                self.cntr += 1
+                attribute_hierarchy = f"{self.hier}.{block.get('code', block.get('name', ''))}"
+                hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
+                if block['type'] in ['document', 'jsonObject']:
+                    if 'arrayItem' not in block.keys() and hash_str not in self.element_dict:
+                        col_desc['description'] = block.get('description', '')
+                        col_desc['active_indicator'] = block.get('isActivated', '')
+                        col_desc['Default value'] = block.get('default', block.get('defaultValue', ''))
+                        col_desc['data_type_name'] = block['type']
+                        col_desc['Precision'] = block.get('precision', '')
+                        self.element_dict[hash_str] = ['Object', 'Parent', attribute_hierarchy, self.cntr, col_desc]
+                elif block['type'] in ['array', 'jsonArray']:
+                    col_desc['description'] = block.get('description', '')
+                    col_desc['active_indicator'] = block.get('isActivated', '')
+                    col_desc['Default value'] = block.get('default', block.get('defaultValue', ''))
+                    col_desc['data_type_name'] = block['type']
+                    col_desc['Precision'] = block.get('precision', '')
+                    self.element_dict[hash_str] = ['Object', 'Parent', attribute_hierarchy, self.cntr, col_desc]
+                else:
+                    db_data_type = block.get('udt_name', block.get('mode', block['type']))
+                    if 'length' in block and block['length']:
+                        db_data_type += f"({block['length']})"
+                    elif 'timePrecision' in block and block['timePrecision']:
+                        db_data_type += f"({block['timePrecision']})"
+                    if 'precision' in block and 'scale' in block and block['scale'] != 0:
+                        db_data_type += f"({block['precision']},{block['scale']})"
+                    col_desc['description'] = block.get('description', '')
+                    col_desc['active_indicator'] = block.get('isActivated', '')
+                    col_desc['pii_indicator'] = block.get('piiIn', '')
+                    col_desc['primary_key_indicator'] = block.get('primaryKey', '')
+                    col_desc['data_type_name'] = db_data_type
+                    col_desc['Default Value'] = block.get('default', block.get('defaultValue', ''))
+                    col_desc['Precision'] = block.get('precision', '')
+                    col_desc['column_length_number'] = block.get('maxLength', block.get('length', ''))
+                    col_desc['Column nullability'] = 'not null' if block.get('required') == 'true' else 'null'
+                    self.element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, self.cntr, col_desc]
+
+                if 'properties' in block:
+                    LegacyPostgreSQLAttributeProcessor(block['properties'], self.hier, self.element_dict).fetch_attributes()
+
+LEGACY_PROCESSORS = {
+    "Oracle": LegacyOracleAttributeProcessor,
+    "PostgreSQL": LegacyPostgreSQLAttributeProcessor,
+}
+
+# Builds a synthetic collection's properties with roughly n_attributes typed
+# blocks, nested `fanout` wide down to `depth` levels
+def build_properties(n_attributes, depth=4, fanout=8, seed=42):
+    rng = random.Random(seed)
+    scalar_types = ['varchar2', 'number', 'date', 'timestamp']
+    made = 0
+
+    def level(prefix, remaining_depth):
+        nonlocal made
+        blocks = []
+        for idx in range(fanout):
+            if made >= n_attributes:
+                break
+            made += 1
+            if remaining_depth and rng.random() < 0.3:
+                block = {'name': f"{prefix}_{idx}", 'type': rng.choice(['document', 'array'])}
+                block['properties'] = level(f"{prefix}_{idx}", remaining_depth - 1)
+            else:
+                block = {'name': f"{prefix}_{idx}", 'type': rng.choice(scalar_types),
+                         'description': 'synthetic', 'isActivated': True, 'length': rng.choice([0, 20])}
+            blocks.append(block)
+        return blocks
+
+    properties = []
+    while made < n_attributes:
+        properties.extend(level(f"c{len(properties)}", depth))
+    return properties
+
+def build_deep_properties(depth):
+    properties = [{'name': 'leaf', 'type': 'varchar2'}]
+    for level in range(depth):
+        properties = [{'name': f"n{level}", 'type': 'document', 'properties': properties}]
+    return properties
+
+# Best of `repeat` runs, in CPU time so other load on the machine doesn't
+# skew the comparison. With gc_off the cyclic GC is paused around the run;
+# both implementations are always timed under the same GC setting.
+def time_run(fetch, repeat, gc_off=False):
+    best = float('inf')
+    element_dict = None
+    for _ in range(repeat):
+        element_dict = {}
+        if gc_off:
+            gc.disable()
+        try:
+            start = time.process_time()
+            fetch(element_dict)
+            best = min(best, time.process_time() - start)
+        finally:
+            gc.enable()
+    return best, element_dict
+
+def legacy_rows(element_dict):
+    entity_list_sorted = sorted(element_dict.items(), key=lambda x: x[1][3])
+    return [[k, v[0], v[1], v[2], v[4]] for k, v in entity_list_sorted]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check walk_attributes against the recursive processors")
+    parser.add_argument("--attributes", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    # Hierarchy strings grow with depth, so memory is O(depth^2); a few times
+    # the recursion limit is enough to show the difference
+    parser.add_argument("--deep", type=int, default=3000, help="nesting depth for the recursion-limit check")
+    args = parser.parse_args()
+
+    hier = 'EALDB.EALDB.SYNTHETIC'
+    properties = build_properties(args.attributes)
+
+    for vendor, legacy_class in LEGACY_PROCESSORS.items():
+        for gc_off in (False, True):
+            legacy_secs, legacy_dict = time_run(
+                lambda element_dict: legacy_class(properties, hier, element_dict).fetch_attributes(),
+                args.repeat, gc_off)
+            walker_secs, walker_dict = time_run(
+                lambda element_dict: walk_attributes(properties, hier, element_dict, VENDOR_RULES[vendor]),
+                args.repeat, gc_off)
+
+            if legacy_rows(legacy_dict) != sort_entity_dict(walker_dict):
+                sys.exit(f"{vendor}: walker output differs from the recursive processor")
+
+            nodes = len(walker_dict)
+            print(f"{vendor:<11} gc={'off' if gc_off else 'on':<3} nodes={nodes} "
+                  f"recursive={nodes / legacy_secs:,.0f} nodes/s walker={nodes / walker_secs:,.0f} nodes/s "
+                  f"walker/recursive time={walker_secs / legacy_secs:.2f}")
+
+    deep_properties = build_deep_properties(args.deep)
+    try:
+        LegacyOracleAttributeProcessor(deep_properties, hier, {}).fetch_attributes()
+        print(f"depth {args.deep}: recursive processor ok")
+    except RecursionError:
+        print(f"depth {args.deep}: recursive processor hit the recursion limit")
+    element_dict = {}
+    walk_attributes(deep_properties, hier, element_dict, VENDOR_RULES["Oracle"])
+    print(f"depth {args.deep}: walker ok ({len(element_dict)} nodes)")
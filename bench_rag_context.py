@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+import bedrock_aws
+from bedrock_aws import (CONTEXT_TOKEN_BUDGET, DATA_DIR, FETCH_K, INDEX_NAME, LOCAL_INDEX_DIR, OPENSEARCH_HOST,
+                         BulkIndexer, LocalVectorStore, OpenSearchVectorSearch, RagSession, bedrock_embeddings,
+                         estimate_tokens, ingest_pdfs)
+
+# Compares the pipeline as it was before token-budgeted packing (10000-char
+# chunks with 1000 overlap, top 3 stuffed into the prompt) with small chunks
+# reranked and packed into a token budget. Each line of the question file is
+#   {"question": "...", "sources": ["report.pdf"], "facts": ["..."], "answer": "..."}
+# where the optional fields are the PDFs a good answer draws on, phrases it
+# must mention, and a reference answer. Source recall scores the context;
+# fact recall and token F1 against the reference score the generated answer.
+
+BASELINE_CHUNK_SIZE = 10000
+BASELINE_CHUNK_OVERLAP = 1000
+BASELINE_K = 3
+
+def baseline_vector_store(data_dir):
+    """Index data_dir with the old chunking, alongside the live index"""
+    if bedrock_aws.VECTOR_BACKEND == "local":
+        path = f"{LOCAL_INDEX_DIR}-baseline"
+        vector_store = LocalVectorStore(path, bedrock_embeddings)
+        ingest_pdfs(data_dir, os.path.join(path, "manifest.json"), vector_store=vector_store,
+                    chunk_size=BASELINE_CHUNK_SIZE, chunk_overlap=BASELINE_CHUNK_OVERLAP)
+        return vector_store
+    index_name = f"{INDEX_NAME}-baseline"
+    ingest_pdfs(data_dir, ".ingest_manifest-baseline.json", vector_store=BulkIndexer(index_name=index_name),
+                chunk_size=BASELINE_CHUNK_SIZE, chunk_overlap=BASELINE_CHUNK_OVERLAP)
+    return OpenSearchVectorSearch(embedding_function=bedrock_embeddings, opensearch_url=OPENSEARCH_HOST,
+                                  index_name=index_name)
+
+def load_questions(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def source_recall(docs, sources):
+    if not sources:
+        return float('nan')
+    found = {os.path.basename(doc.metadata.get('source', '')) for doc in docs}
+    return len(found & set(sources)) / len(sources)
+
+def fact_recall(answer, facts):
+    if answer is None or not facts:
+        return float('nan')
+    answer = answer.lower()
+    return sum(fact.lower() in answer for fact in facts) / len(facts)
+
+def answer_f1(answer, reference):
+    """SQuAD-style token F1 between the generated and the reference answer"""
+    if answer is None or not reference:
+        return float('nan')
+    answer_tokens = Counter(re.findall(r"\w+", answer.lower()))
+    reference_tokens = Counter(re.findall(r"\w+", reference.lower()))
+    common = sum((answer_tokens & reference_tokens).values())
+    if not common:
+        return 0.0
+    precision = common / sum(answer_tokens.values())
+    recall = common / sum(reference_tokens.values())
+    return 2 * precision * recall / (precision + recall)
+
+def run(session, questions, llm_name, ask_llm):
+    rows = []
+    for item in questions:
+        timing, answer = {}, None
+        if ask_llm:
+            result = session.ask(item['question'], llm_name)
+            docs, timing, answer = result['source_documents'], result['timing'], result['result']
+        else:
+            _, docs, _ = session.retrieve(item['question'], timing)
+        rows.append({
+            'chars': sum(len(doc.page_content) for doc in docs),
+            'tokens': sum(estimate_tokens(doc.page_content) for doc in docs),
+            'recall': source_recall(docs, item.get('sources')),
+            'facts': fact_recall(answer, item.get('facts')),
+            'f1': answer_f1(answer, item.get('answer')),
+            'llm_ms': timing.get('llm', float('nan')) * 1000,
+        })
+    return rows
+
+def _mean(rows, key, fmt):
+    values = np.array([row[key] for row in rows], dtype=float)
+    return fmt.format(np.nanmean(values)) if not np.isnan(values).all() else "n/a"
+
+def summarize(name, rows):
+    tokens = np.array([row['tokens'] for row in rows])
+    print(f"{name:<8} context chars mean={_mean(rows, 'chars', '{:.0f}')} tokens mean={tokens.mean():.0f} "
+          f"max={tokens.max()} source recall={_mean(rows, 'recall', '{:.2f}')} "
+          f"fact recall={_mean(rows, 'facts', '{:.2f}')} answer F1={_mean(rows, 'f1', '{:.2f}')} "
+          f"llm mean={_mean(rows, 'llm_ms', '{:.0f} ms')}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the old 10000-char top-3 context with token-budgeted packing")
+    parser.add_argument("questions", help="JSONL file of {question, sources, facts, answer}")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="PDFs to index with the old chunking for the baseline")
+    parser.add_argument("--llm", default="llama2", choices=["claude", "llama2"])
+    parser.add_argument("--fetch-k", type=int, default=FETCH_K)
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKEN_BUDGET)
+    parser.add_argument("--no-llm", action="store_true", help="only compare retrieved context, skip generation")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    baseline = RagSession(vector_store=baseline_vector_store(args.data_dir), k=BASELINE_K, cache=False,
+                          token_budget=None)
+    packed = RagSession(cache=False, fetch_k=args.fetch_k, token_budget=args.budget)
+    summarize("baseline", run(baseline, questions, args.llm, not args.no_llm))
+    summarize("packed", run(packed, questions, args.llm, not args.no_llm))
@@ -0,0 +1,200 @@
+import argparse
+import copy
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Local stand-ins for the Bedrock embedding and streaming generation services
+# and the OpenSearch bulk API, so ingestion and Q&A can be run and load-tested
+# offline:
+#   python fake_rag_server.py --port 8089 --capacity 8
+#   EMBEDDING_ENDPOINT=http://localhost:8089/embed LLM_ENDPOINT=http://localhost:8089/generate \
+#       VECTOR_BACKEND=local python bedrock_aws.py
+
+
+def fake_embedding(text, dims):
+    """Deterministic unit vector per text"""
+    seed = int(hashlib.sha256(text.encode()).hexdigest()[:16], 16)
+    vector = np.random.default_rng(seed).standard_normal(dims)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def fake_answer(prompt, num_tokens):
+    """Deterministic pseudo-answer tokens for a prompt"""
+    rng = np.random.default_rng(int(hashlib.sha256(prompt.encode()).hexdigest()[:16], 16))
+    vocabulary = ["the", "report", "finds", "that", "coding", "risk", "scores", "improve", "with", "data", "and",
+                  "review", "of", "claims", "across", "members", "providers", "shows", "gaps", "in"]
+    return [(" " if i else "") + vocabulary[j] for i, j in enumerate(rng.integers(0, len(vocabulary), num_tokens))]
+
+
+class FakeRagHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_generation(self, request):
+        """Llama2-style NDJSON {"generation": token} chunks, one every token_latency seconds"""
+        server = self.server
+        max_tokens = request.get("max_gen_len") or request.get("maxTokens") or server.answer_tokens
+        words = fake_answer(request["prompt"], min(max_tokens, server.answer_tokens))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(server.first_token_latency)
+        for word in words:
+            time.sleep(server.token_latency)
+            data = (json.dumps({"generation": word}) + "\n").encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        with server.lock:
+            server.stats["generations"] += 1
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        server = self.server
+        if self.path == "/generate":
+            self._stream_generation(request)
+            return
+        if self.path != "/embed":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        # Reject requests over capacity with 429, the way Bedrock throttles
+        with server.lock:
+            if server.in_flight >= server.capacity:
+                server.stats["throttled"] += 1
+                throttled = True
+            else:
+                server.in_flight += 1
+                throttled = False
+        if throttled:
+            self._send_json(429, {"error": "Too many requests"})
+            return
+        try:
+            time.sleep(server.latency * len(request["texts"]))
+            embeddings = [fake_embedding(text, server.dims) for text in request["texts"]]
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+                server.stats["requests"] += 1
+                server.stats["texts"] += len(request["texts"])
+        self._send_json(200, {"embeddings": embeddings})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=8089, dims=1536, latency=0.02, capacity=8, first_token_latency=0.3, token_latency=0.02,
+                answer_tokens=300):
+    """Build (but do not start) a fake server; port=0 picks a free port"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeRagHandler)
+    server.daemon_threads = True
+    server.dims = dims
+    server.latency = latency
+    server.capacity = capacity
+    server.first_token_latency = first_token_latency
+    server.token_latency = token_latency
+    server.answer_tokens = answer_tokens
+    server.in_flight = 0
+    server.lock = threading.Lock()
+    server.stats = {"requests": 0, "texts": 0, "throttled": 0, "generations": 0}
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a fake server on a background thread and return it with its base URL"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class _FakeIndices:
+    def __init__(self, store):
+        self.store = store
+
+    def exists(self, index):
+        return index in self.store.indexes
+
+    def create(self, index, body):
+        settings = copy.deepcopy(body.get("settings", {}).get("index", {}))
+        self.store.indexes[index] = {"settings": settings, "docs": {}, "searchable": {}}
+
+    def get_settings(self, index):
+        return {index: {"settings": {"index": copy.deepcopy(self.store.indexes[index]["settings"])}}}
+
+    def put_settings(self, index, body):
+        self.store.indexes[index]["settings"].update(body["index"])
+        self.store.settings_log.append(dict(body["index"]))
+
+    def refresh(self, index):
+        idx = self.store.indexes[index]
+        idx["searchable"] = dict(idx["docs"])
+
+
+class InMemoryOpenSearch:
+    """In-process stand-in for the opensearch-py client calls the bulk indexer makes.
+
+    reject_rate makes that share of bulk items fail with 429, like a full
+    write queue, and request_reject_rate that share of whole _bulk requests;
+    docs only become searchable on refresh, as in OpenSearch.
+    """
+
+    def __init__(self, reject_rate=0.0, seed=0, request_reject_rate=0.0):
+        self.indexes = {}
+        self.settings_log = []
+        self.reject_rate = reject_rate
+        self.request_reject_rate = request_reject_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.indices = _FakeIndices(self)
+        self.bulk_requests = 0
+
+    def bulk(self, body):
+        items = []
+        with self.lock:
+            self.bulk_requests += 1
+            if self.random.random() < self.request_reject_rate:
+                from opensearchpy.exceptions import TransportError
+                raise TransportError(429, "rejected_execution_exception", {})
+            lines = iter(body)
+            for header in lines:
+                op, meta = next(iter(header.items()))
+                docs = self.indexes[meta["_index"]]["docs"]
+                source = next(lines) if op == "index" else None
+                if self.random.random() < self.reject_rate:
+                    items.append({op: {"_id": meta["_id"], "status": 429}})
+                elif op == "index":
+                    docs[meta["_id"]] = source
+                    items.append({op: {"_id": meta["_id"], "status": 201}})
+                else:
+                    found = docs.pop(meta["_id"], None) is not None
+                    items.append({op: {"_id": meta["_id"], "status": 200 if found else 404}})
+        return {"errors": any(item[next(iter(item))]["status"] >= 300 for item in items), "items": items}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake embedding endpoint for offline RAG runs")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per embedded text")
+    parser.add_argument("--capacity", type=int, default=8, help="Concurrent requests before returning 429")
+    parser.add_argument("--first-token-latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Seconds between generated tokens")
+    parser.add_argument("--answer-tokens", type=int, default=300, help="Tokens per generated answer")
+    args = parser.parse_args()
+    server = make_server(args.port, args.dims, args.latency, args.capacity, args.first_token_latency,
+                         args.token_latency, args.answer_tokens)
+    print(f"Fake RAG server on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -1,159 +1,176 @@
+import argparse
+import ast
 import base64
+import csv
+import functools
+import gc
 import hashlib
+import itertools
 import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
+# Each flattened node is a 5-element list kept in entity_dict:
+# [node_type, node_kind, hierarchy, cntr, col_desc]. Plain lists are the
+# cheapest record to build in the walker's inner loop and to pickle back
+# from pool workers.
+NODE_CNTR = 3
+
+# Bound once: the handlers hash every attribute hierarchy
+_md5 = hashlib.md5
+
+# Per-vendor rules: each handler adds the node for one typed block to
+# element_dict. Oracle and DB2 nest child hierarchies under their parent
+# attribute, PostgreSQL keeps nested attributes at the parent's level.
+def _add_leaf_column(block, attribute_hierarchy, cntr, element_dict):
+    hash_str = _md5(attribute_hierarchy.encode('utf-8')).hexdigest()
+    if hash_str not in element_dict:
+        col_desc = {
+            'description': block.get('description', ''),
+            'active_indicator': block.get('isActivated', ''),
+            'data_type_name': block['type'],
+        }
+        element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, cntr, col_desc]
+
+def _add_pg_json_object(block, attribute_hierarchy, cntr, element_dict):
+    if 'arrayItem' in block:
+        return
+    hash_str = _md5(attribute_hierarchy.encode('utf-8')).hexdigest()
+    if hash_str not in element_dict:
+        attr_type_nm = 'Object'
+        if len(attribute_hierarchy.split('.')) == 3:
+            attr_type_nm = 'Table'
+        col_desc = {
+            'description': block.get('description', ''),
+            'active_indicator': block.get('isActivated', ''),
+            'Default value': block.get('default', block.get('defaultValue', '')),
+            'data_type_name': block['type'],
+            'Precision': block.get('precision', ''),
+        }
+        element_dict[hash_str] = [attr_type_nm, 'Parent', attribute_hierarchy, cntr, col_desc]
+
+def _add_pg_json_array(block, attribute_hierarchy, cntr, element_dict):
+    hash_str = _md5(attribute_hierarchy.encode('utf-8')).hexdigest()
+    col_desc = {
+        'description': block.get('description', ''),
+        'active_indicator': block.get('isActivated', ''),
+        'Default value': block.get('default', block.get('defaultValue', '')),
+        'data_type_name': block['type'],
+        'Precision': block.get('precision', ''),
+    }
+    element_dict[hash_str] = ['Object', 'Parent', attribute_hierarchy, cntr, col_desc]
+
+def _add_pg_column(block, attribute_hierarchy, cntr, element_dict):
+    hash_str = _md5(attribute_hierarchy.encode('utf-8')).hexdigest()
+
+    db_data_type = block.get('udt_name', block.get('mode', ",".join([block['type']])))
+    if 'length' in block and block['length']:
+        db_data_type += f"({block['length']})"
+    elif 'timePrecision' in block and block['timePrecision']:
+        db_data_type += f"({block['timePrecision']})"
+    if 'precision' in block and 'scale' in block and block['scale'] != 0:
+        db_data_type += f"({block['precision']},{block['scale']})"
+
+    col_desc = {
+        'description': block.get('description', ''),
+        'active_indicator': block.get('isActivated', ''),
+        'pii_indicator': block.get('piiIn', ''),
+        'primary_key_indicator': block.get('primaryKey', ''),
+        'data_type_name': db_data_type,
+        'Default Value': block.get('default', block.get('defaultValue', '')),
+        'Precision': block.get('precision', ''),
+        'column_length_number': block.get('maxLength', block.get('length', '')),
+        'Column nullability': 'not null' if block.get('required') == 'true' else 'null',
+    }
+    element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, cntr, col_desc]
+
+VENDOR_RULES = {
+    "Oracle": {'handlers': {}, 'default': _add_leaf_column, 'nest_hierarchy': True},
+    "DB2": {'handlers': {}, 'default': _add_leaf_column, 'nest_hierarchy': True},
+    "PostgreSQL": {
+        'handlers': {
+            'document': _add_pg_json_object,
+            'jsonObject': _add_pg_json_object,
+            'array': _add_pg_json_array,
+            'jsonArray': _add_pg_json_array,
+        },
+        'default': _add_pg_column,
+        'nest_hierarchy': False,
+    },
+}
+
+# Walks nested 'properties' blocks depth-first with an explicit stack, so deep
+# documents neither allocate a processor per level nor hit the recursion
+# limit. cntr restarts at 0 for every properties list, as it did with one
+# processor per level.
+def walk_attributes(properties, hier, element_dict, vendor_rules):
+    handlers = vendor_rules['handlers']
+    default_handler = vendor_rules['default']
+    nest_hierarchy = vendor_rules['nest_hierarchy']
+    get_handler = handlers.get
+
+    stack = []
+    block_iter, parent_hier, cntr = iter(properties), hier, 0
+    while True:
+        for block in block_iter:
+            if 'type' not in block:
+                continue
+            cntr += 1
+            attribute_hierarchy = f"{parent_hier}.{block.get('code', block.get('name', ''))}"
+            handler = get_handler(block['type'], default_handler) if handlers else default_handler
+            handler(block, attribute_hierarchy, cntr, element_dict)
+
+            if 'properties' in block:
+                stack.append((block_iter, parent_hier, cntr))
+                if nest_hierarchy:
+                    parent_hier = attribute_hierarchy
+                block_iter, cntr = iter(block['properties']), 0
+                break
+        else:
+            if not stack:
+                break
+            block_iter, parent_hier, cntr = stack.pop()
+
 # Base class for handling attribute fetching
 class BaseAttributeProcessor:
+    vendor_rules = None
+
     def __init__(self, properties, hier, element_dict):
         self.properties = properties
         self.hier = hier
         self.element_dict = element_dict
-        self.cntr = 0
 
     def fetch_attributes(self):
-        raise NotImplementedError("Subclasses should implement this method.")
+        if self.vendor_rules is None:
+            raise NotImplementedError("Subclasses should implement this method.")
+        walk_attributes(self.properties, self.hier, self.element_dict, self.vendor_rules)
 
 # Child class for Oracle processing
 class OracleAttributeProcessor(BaseAttributeProcessor):
-    def fetch_attributes(self):
-        for idx, block in enumerate(self.properties):
-            col_desc = {}
-            if 'type' in block:
-                self.cntr += 1
-                data_type = block['type']
-
-                attribute_hierarchy = self._get_attribute_hierarchy(block)
-                hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
-                
-                if hash_str not in self.element_dict:
-                    col_desc['description'] = block.get('description', '')
-                    col_desc['active_indicator'] = block.get('isActivated', '')
-                    col_desc['data_type_name'] = data_type
-                    # Additional Oracle-specific fields can be added here
-                    self.element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, self.cntr, col_desc]
-
-                if 'properties' in block:
-                    OracleAttributeProcessor(block['properties'], attribute_hierarchy, self.element_dict).fetch_attributes()
-
-    def _get_attribute_hierarchy(self, block):
-        return f"{self.hier}.{block.get('code', block.get('name', ''))}"
+    vendor_rules = VENDOR_RULES["Oracle"]
 
 # Child class for DB2 processing
 class DB2AttributeProcessor(BaseAttributeProcessor):
-    def fetch_attributes(self):
-        for idx, block in enumerate(self.properties):
-            col_desc = {}
-            if 'type' in block:
-                self.cntr += 1
-                data_type = block['type']
-
-                attribute_hierarchy = self._get_attribute_hierarchy(block)
-                hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
-                
-                if hash_str not in self.element_dict:
-                    col_desc['description'] = block.get('description', '')
-                    col_desc['active_indicator'] = block.get('isActivated', '')
-                    col_desc['data_type_name'] = data_type
-                    # Additional DB2-specific fields can be added here
-                    self.element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, self.cntr, col_desc]
-
-                if 'properties' in block:
-                    DB2AttributeProcessor(block['properties'], attribute_hierarchy, self.element_dict).fetch_attributes()
-
-    def _get_attribute_hierarchy(self, block):
-        return f"{self.hier}.{block.get('code', block.get('name', ''))}"
+    vendor_rules = VENDOR_RULES["DB2"]
 
 # Child class for PostgreSQL processing
 class PostgreSQLAttributeProcessor(BaseAttributeProcessor):
-    def fetch_attributes(self):
-        for idx, block in enumerate(self.properties):
-            col_desc = {}
-            if 'type' in block:
-                self.cntr += 1
-                data_type = [block['type']]
-                data_type = ",".join(data_type)
-
-                if block['type'] in ['document', 'jsonObject']:
-                    self._process_json_object(block, col_desc)
-                elif block['type'] in ['array', 'jsonArray']:
-                    self._process_json_array(block, col_desc)
-                else:
-                    self._process_regular_attribute(block, col_desc, data_type)
-
-                if 'properties' in block:
-                    PostgreSQLAttributeProcessor(block['properties'], self.hier, self.element_dict).fetch_attributes()
-
-    def _process_json_object(self, block, col_desc):
-        if 'arrayItem' not in block.keys():
-            attribute_hierarchy = self._get_attribute_hierarchy(block)
-            hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
-
-            if hash_str not in self.element_dict:
-                attr_type_nm = 'Object'
-                if len(attribute_hierarchy.split('.')) == 3:
-                    attr_type_nm = 'Table'
-                col_desc['description'] = block.get('description', '')
-                col_desc['active_indicator'] = block.get('isActivated', '')
-                col_desc['Default value'] = block.get('default', block.get('defaultValue', ''))
-                col_desc['data_type_name'] = block['type']
-                col_desc['Precision'] = block.get('precision', '')
-                self.element_dict[hash_str] = [attr_type_nm, 'Parent', attribute_hierarchy, self.cntr, col_desc]
-
-    def _process_json_array(self, block, col_desc):
-        attribute_hierarchy = self._get_attribute_hierarchy(block)
-        hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
-
-        col_desc['description'] = block.get('description', '')
-        col_desc['active_indicator'] = block.get('isActivated', '')
-        col_desc['Default value'] = block.get('default', block.get('defaultValue', ''))
-        col_desc['data_type_name'] = block['type']
-        col_desc['Precision'] = block.get('precision', '')
-        self.element_dict[hash_str] = ['Object', 'Parent', attribute_hierarchy, self.cntr, col_desc]
-
-    def _process_regular_attribute(self, block, col_desc, data_type):
-        attribute_hierarchy = self._get_attribute_hierarchy(block)
-        hash_str = hashlib.md5(attribute_hierarchy.encode('utf-8')).hexdigest()
-
-        db_data_type = block.get('udt_name', block.get('mode', data_type))
-        if 'length' in block and block['length']:
-            db_data_type += f"({block['length']})"
-        elif 'timePrecision' in block and block['timePrecision']:
-            db_data_type += f"({block['timePrecision']})"
-        if 'precision' in block and 'scale' in block and block['scale'] != 0:
-            db_data_type += f"({block['precision']},{block['scale']})"
-
-        col_desc['description'] = block.get('description', '')
-        col_desc['active_indicator'] = block.get('isActivated', '')
-        col_desc['pii_indicator'] = block.get('piiIn', '')
-        col_desc['primary_key_indicator'] = block.get('primaryKey', '')
-        col_desc['data_type_name'] = db_data_type
-        col_desc['Default Value'] = block.get('default', block.get('defaultValue', ''))
-        col_desc['Precision'] = block.get('precision', '')
-        col_desc['column_length_number'] = block.get('maxLength', block.get('length', ''))
-        col_desc['Column nullability'] = 'not null' if block.get('required') == 'true' else 'null'
-
-        self.element_dict[hash_str] = ['Column', 'Leaf', attribute_hierarchy, self.cntr, col_desc]
-
-    def _get_attribute_hierarchy(self, block):
-        return f"{self.hier}.{block.get('code', block.get('name', ''))}"
+    vendor_rules = VENDOR_RULES["PostgreSQL"]
 
-def process_hackolade_data(inp_trnsfm, db_nm):
-    entity_dict = {}
-    
-    # Determine which processor to use based on dbVendor
-    db_vendor = inp_trnsfm.get("dbVendor", "")
-    print(db_vendor)
+# Maps the model's dbVendor to the processor that knows its attribute layout
+def get_processor_class(db_vendor):
     if db_vendor == "Oracle":
-        processor_class = OracleAttributeProcessor
+        return OracleAttributeProcessor
     elif db_vendor == "DB2":
-        processor_class = DB2AttributeProcessor
+        return DB2AttributeProcessor
     elif db_vendor == "PostgreSQL":
-        processor_class = PostgreSQLAttributeProcessor
-    else:
-        raise ValueError(f"Unsupported dbVendor: {db_vendor}")
+        return PostgreSQLAttributeProcessor
+    raise ValueError(f"Unsupported dbVendor: {db_vendor}")
 
-    cntr = 0
+# Adds the Database and Schema parent nodes and returns the schema hierarchy
+def add_top_level_nodes(entity_dict, db_nm, cntr=0):
     top_hier = db_nm
     hash_str = hashlib.md5(top_hier.encode('utf-8')).hexdigest()
     entity_dict[hash_str] = ['Database', 'Parent', top_hier, cntr, {}]
@@ -161,41 +178,667 @@ def process_hackolade_data(inp_trnsfm, db_nm):
     schema_nm = f"{db_nm}.EALDB"
     hash_str = hashlib.md5(schema_nm.encode('utf-8')).hexdigest()
     entity_dict[hash_str] = ['Schema', 'Parent', schema_nm, cntr, {}]
+    return schema_nm
 
-    data = inp_trnsfm['collections']
-    
-    for idx, items in enumerate(data):
-        json_data = items
-        cntr += 1
-
-        collection_name = json_data.get('collectionName')
-        if not collection_name:
-            raise Exception("Collection is missing a 'collectionName'.")
+# Flattens a single collection (table) and its attributes into entity_dict
+def flatten_collection(processor_class, json_data, schema_nm, cntr, entity_dict):
+    collection_name = json_data.get('collectionName')
+    if not collection_name:
+        raise Exception("Collection is missing a 'collectionName'.")
 
-        collection_hierarchy = f"{schema_nm}.{collection_name}"
-        hash_str = hashlib.md5(collection_hierarchy.encode('utf-8')).hexdigest()
-        entity_dict[hash_str] = ['Table', 'Parent', collection_hierarchy, cntr, {}]
+    collection_hierarchy = f"{schema_nm}.{collection_name}"
+    hash_str = hashlib.md5(collection_hierarchy.encode('utf-8')).hexdigest()
+    entity_dict[hash_str] = ['Table', 'Parent', collection_hierarchy, cntr, {}]
 
-        if 'properties' not in json_data:
-            raise Exception("Properties missing in Collection")
+    if 'properties' not in json_data:
+        raise Exception("Properties missing in Collection")
 
-        # Use the appropriate processor to fetch attributes
-        processor_instance = processor_class(json_data['properties'], collection_hierarchy, entity_dict)
-        processor_instance.fetch_attributes()
+    # Use the appropriate processor to fetch attributes
+    processor_instance = processor_class(json_data['properties'], collection_hierarchy, entity_dict)
+    processor_instance.fetch_attributes()
+    return collection_name
 
-    entity_list_sorted = sorted(entity_dict.items(), key=lambda x: x[1][3])
+def sort_entity_dict(entity_dict):
+    entity_list_sorted = sorted(entity_dict.items(), key=lambda x: x[1][NODE_CNTR])
     return [[k, v[0], v[1], v[2], v[4]] for k, v in entity_list_sorted]
 
-if __name__ == "__main__":
-    data_file_path = r"/Users/saswatswain/Downloads/Oracle_datatypes_POC.json"
+def process_hackolade_data(inp_trnsfm, db_nm):
+    entity_dict = {}
     
-    with open(data_file_path, mode='r') as file_in:
-        inp_transform = json.load(file_in)
+    # Determine which processor to use based on dbVendor
+    db_vendor = inp_trnsfm.get("dbVendor", "")
+    print(db_vendor)
+    processor_class = get_processor_class(db_vendor)
+
+    cntr = 0
+    schema_nm = add_top_level_nodes(entity_dict, db_nm, cntr)
 
-    attribute_list = process_hackolade_data(inp_transform, 'EALDB')
+    data = inp_trnsfm['collections']
     
-    for idx, node_list in enumerate(attribute_list):
-        print(idx, node_list)
+    for idx, items in enumerate(data):
+        cntr += 1
+        flatten_collection(processor_class, items, schema_nm, cntr, entity_dict)
+
+    return sort_entity_dict(entity_dict)
+
+# Process-pool worker: flattens a group of collections that share a
+# collectionName, in model order, against one local dict. Returns compact row
+# tuples (cntr, member, idx, key, node_type, node_kind, hierarchy, col_desc),
+# already sorted: member is the collection's index within the group and idx
+# the position of the key among the keys that collection first added, which
+# is how the serial run breaks ties in cntr. Nothing but these rows crosses
+# the process boundary.
+def _flatten_collection_group(db_vendor, schema_nm, group):
+    processor_class = get_processor_class(db_vendor)
+    entity_dict = {}
+    new_keys = []
+    for cntr, json_data in group:
+        before = len(entity_dict)
+        flatten_collection(processor_class, json_data, schema_nm, cntr, entity_dict)
+        new_keys.append(list(itertools.islice(entity_dict, before, None)))
+    rows = []
+    for member, keys in enumerate(new_keys):
+        for idx, key in enumerate(keys):
+            node = entity_dict[key]
+            rows.append((node[NODE_CNTR], member, idx, key, node[0], node[1], node[2], node[4]))
+    rows.sort(key=_group_row_order)
+    return rows
+
+def _group_row_order(row):
+    return row[0], row[1], row[2]
+
+# Pool variant: the rows travel as one pickled blob, so the parent decodes
+# them inside its GC-paused merge instead of in the executor's result thread
+def _flatten_collection_group_pickled(db_vendor, schema_nm, group):
+    return pickle.dumps(_flatten_collection_group(db_vendor, schema_nm, group), protocol=pickle.HIGHEST_PROTOCOL)
+
+# On-disk cache of flattened collection groups, keyed by a hash of the
+# vendor, schema and collection content. The Table node's cntr depends on the
+# collection's position in the model, so it is patched on every hit.
+class CollectionCache:
+    CACHE_VERSION = 2
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.join(cache_dir, 'collections')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, db_vendor, schema_nm, group):
+        key_src = json.dumps([self.CACHE_VERSION, db_vendor, schema_nm, [items for _, items in group]], sort_keys=True)
+        return hashlib.sha256(key_src.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key, schema_nm, group):
+        path = self._path(key)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        with open(path, mode='r') as file_in:
+            rows = json.load(file_in)
+        table_hash = _md5(f"{schema_nm}.{group[-1][1]['collectionName']}".encode('utf-8')).hexdigest()
+        rows = [tuple(row) if row[3] != table_hash else (group[-1][0], *row[1:]) for row in rows]
+        rows.sort(key=_group_row_order)
+        self.hits += 1
+        return rows
+
+    def put(self, key, rows):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, mode='w') as file_out:
+            json.dump(rows, file_out)
+        os.replace(tmp_path, path)
+
+# Parallel variant of process_hackolade_data. Collections are fanned out to a
+# process pool and merged back in model order, so the output matches the
+# serial cntr ordering exactly. Collections with the same collectionName
+# write to the same hierarchy, so they are kept together in one task.
+# With a CollectionCache, unchanged collections are not flattened again.
+# Workers send back sorted row tuples, so the parent's share of the work is
+# one unpickle and one merge sort over already-sorted runs. The cyclic GC is
+# paused only around that decode and merge, which allocate nothing but
+# acyclic rows; workers, the serial flatten and cache writes run with GC as
+# the caller left it.
+def process_hackolade_data_parallel(inp_trnsfm, db_nm, max_workers=None, chunksize=None, cache=None):
+    top_level = {}
 
-    df = pd.DataFrame(attribute_list)
-    df.to_csv(r"output.csv", index=False)
+    db_vendor = inp_trnsfm.get("dbVendor", "")
+    print(db_vendor)
+    get_processor_class(db_vendor)
+
+    schema_nm = add_top_level_nodes(top_level, db_nm)
+
+    groups = {}
+    for cntr, items in enumerate(inp_trnsfm['collections'], start=1):
+        groups.setdefault(items.get('collectionName'), []).append((cntr, items))
+    groups = list(groups.values())
+
+    results = [None] * len(groups)
+    cache_keys = [None] * len(groups)
+    if cache is not None:
+        for idx, group in enumerate(groups):
+            if group[0][1].get('collectionName'):
+                cache_keys[idx] = cache.key(db_vendor, schema_nm, group)
+                results[idx] = cache.get(cache_keys[idx], schema_nm, group)
+    pending = [idx for idx, result in enumerate(results) if result is None]
+    pending_groups = [groups[idx] for idx in pending]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(pending_groups) < 2:
+        worker = functools.partial(_flatten_collection_group, db_vendor, schema_nm)
+        pending_results = list(map(worker, pending_groups))
+    else:
+        worker = functools.partial(_flatten_collection_group_pickled, db_vendor, schema_nm)
+        # Batch small collections per task to keep pickling overhead down
+        chunksize = chunksize or max(1, len(pending_groups) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending_results = list(executor.map(worker, pending_groups, chunksize=chunksize))
+    for idx, result in zip(pending, pending_results):
+        results[idx] = result
+
+    # Sort key (cntr, model position of the collection that first added the
+    # key, index among its new keys) reproduces the serial stable sort
+    merged = [((node[NODE_CNTR], 0, idx), (key, *node[:3], node[4]))
+              for idx, (key, node) in enumerate(top_level.items())]
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for idx in pending:
+            if isinstance(results[idx], bytes):
+                results[idx] = pickle.loads(results[idx])
+        for group, rows in zip(groups, results):
+            positions = [cntr for cntr, _ in group]
+            merged.extend(((row[0], positions[row[1]], row[2]), row[3:]) for row in rows)
+        merged.sort(key=_merged_row_order)
+        attribute_list = [list(row) for _, row in merged]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    if cache is not None:
+        for idx in pending:
+            cache.put(cache_keys[idx], results[idx])
+    return attribute_list
+
+def _merged_row_order(item):
+    return item[0]
+
+def hash_file(file_path, block_size=1 << 20):
+    file_hash = hashlib.sha256()
+    with open(file_path, mode='rb') as file_in:
+        for block in iter(lambda: file_in.read(block_size), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+# Batch entry point: flattens every *.json export in input_dir to a catalog of
+# the same name in output_dir (csv, parquet or arrow). A manifest in cache_dir records each export's
+# content hash and vendor, so unchanged exports are skipped outright and
+# changed ones only re-flatten the collections that actually changed.
+def process_hackolade_directory(input_dir, output_dir, db_nm='EALDB', cache_dir=None, max_workers=1,
+                               output_format='csv'):
+    cache_dir = cache_dir or os.path.join(output_dir, '.hackolade_cache')
+    os.makedirs(output_dir, exist_ok=True)
+    cache = CollectionCache(cache_dir)
+
+    manifest_path = os.path.join(cache_dir, 'exports.json')
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, mode='r') as file_in:
+            manifest = json.load(file_in)
+
+    summary = {'processed': [], 'skipped': []}
+    for file_name in sorted(os.listdir(input_dir)):
+        if not file_name.lower().endswith('.json'):
+            continue
+        data_file_path = os.path.join(input_dir, file_name)
+        output_path = os.path.join(output_dir, f"{os.path.splitext(file_name)[0]}.{output_format}")
+
+        content_hash = hash_file(data_file_path)
+        entry = manifest.get(file_name)
+        if (entry and entry['sha256'] == content_hash and entry['db_nm'] == db_nm
+                and entry['cache_version'] == CollectionCache.CACHE_VERSION and os.path.exists(output_path)):
+            summary['skipped'].append(file_name)
+            continue
+
+        with open(data_file_path, mode='r') as file_in:
+            inp_transform = json.load(file_in)
+        attribute_list = process_hackolade_data_parallel(inp_transform, db_nm, max_workers=max_workers, cache=cache)
+
+        with open_catalog_writer(output_path) as writer:
+            writer.write_rows(attribute_list)
+
+        manifest[file_name] = {
+            'sha256': content_hash,
+            'db_vendor': inp_transform.get('dbVendor', ''),
+            'db_nm': db_nm,
+            'cache_version': CollectionCache.CACHE_VERSION,
+        }
+        # Persist after every export so an interrupted run keeps its progress
+        with open(f"{manifest_path}.tmp", mode='w') as file_out:
+            json.dump(manifest, file_out, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+        summary['processed'].append(file_name)
+
+    summary['collection_cache_hits'] = cache.hits
+    summary['collection_cache_misses'] = cache.misses
+    return summary
+
+# Incremental reader for the top level of a Hackolade export. Each top-level
+# value, and each element of 'collections', is decoded on its own with
+# raw_decode, so only the collection being parsed is held in memory.
+class HackoladeStreamReader:
+    def __init__(self, file_in, chunk_size=1 << 20):
+        self.file_in = file_in
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self, size=None):
+        chunk = self.file_in.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed before growing the buffer
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read_more():
+                raise ValueError("Unexpected end of Hackolade export")
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Malformed Hackolade export: expected one of {chars!r}, found {char!r}")
+        self.pos += 1
+        return char
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value not fully buffered yet; read at least as much again so
+                # large collections are re-scanned a logarithmic number of times
+                if not self._read_more(max(self.chunk_size, len(self.buf) - self.pos)):
+                    raise
+                continue
+            # A number that ends exactly at the buffer edge may be truncated
+            if end == len(self.buf) and not self.eof and self._read_more():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Yield (key, value) for top-level entries and ('collections', item) per collection."""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if key == 'collections' and self._peek() == '[':
+                self.pos += 1
+                if self._peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self._decode()
+                        if self._expect(',]') == ']':
+                            break
+            else:
+                yield key, self._decode()
+            if self._expect(',}') == '}':
+                return
+
+# Finds dbVendor when it is stored after the collections in the export
+def peek_db_vendor(data_file_path):
+    with open(data_file_path, mode='r') as file_in:
+        for key, value in HackoladeStreamReader(file_in).items():
+            if key == 'dbVendor':
+                return value
+    return ""
+
+# Writes flattened rows in the same layout as pd.DataFrame(attribute_list).to_csv(index=False)
+class CsvCatalogWriter:
+    def __init__(self, output_path):
+        self.file_out = open(output_path, mode='w', newline='')
+        self.csv_writer = csv.writer(self.file_out)
+        self.csv_writer.writerow(range(5))
+
+    def write_rows(self, rows):
+        self.csv_writer.writerows(rows)
+
+    def close(self):
+        self.file_out.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+_TRUE_STRINGS = {'true', 'y', 'yes', '1'}
+_FALSE_STRINGS = {'false', 'n', 'no', '0'}
+
+class _UnfitValue(Exception):
+    pass
+
+def _to_catalog_str(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _UnfitValue
+
+def _to_catalog_bool(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.lower() in _TRUE_STRINGS:
+            return True
+        if value.lower() in _FALSE_STRINGS:
+            return False
+    raise _UnfitValue
+
+def _to_catalog_int(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise _UnfitValue
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    raise _UnfitValue
+
+# Typed catalog columns expanded from col_desc: (column, col_desc keys, arrow
+# type, coercer). PostgreSQL spells the default key two ways, both land in
+# default_value. Values that do not fit their column, and keys not listed
+# here, are kept as JSON in extra_col_desc so nothing is lost.
+CATALOG_COLUMNS = [
+    ('description', ('description',), 'string', _to_catalog_str),
+    ('active_indicator', ('active_indicator',), 'bool_', _to_catalog_bool),
+    ('data_type_name', ('data_type_name',), 'string', _to_catalog_str),
+    ('pii_indicator', ('pii_indicator',), 'bool_', _to_catalog_bool),
+    ('primary_key_indicator', ('primary_key_indicator',), 'bool_', _to_catalog_bool),
+    ('default_value', ('Default value', 'Default Value'), 'string', _to_catalog_str),
+    ('precision', ('Precision',), 'int64', _to_catalog_int),
+    ('column_length_number', ('column_length_number',), 'int64', _to_catalog_int),
+    ('column_nullability', ('Column nullability',), 'string', _to_catalog_str),
+]
+_CATALOG_KEYS = {key for _, keys, _, _ in CATALOG_COLUMNS for key in keys}
+
+def catalog_arrow_schema():
+    import pyarrow as pa
+    fields = [(name, pa.string()) for name in ('hash_key', 'node_type', 'node_kind', 'hierarchy')]
+    fields += [(name, getattr(pa, arrow_type)()) for name, _, arrow_type, _ in CATALOG_COLUMNS]
+    fields.append(('extra_col_desc', pa.string()))
+    return pa.schema(fields)
+
+# Expands one flattened row into a dict of typed catalog column values
+def expand_catalog_row(row):
+    hash_str, node_type, node_kind, hierarchy, col_desc = row
+    values = {'hash_key': hash_str, 'node_type': node_type, 'node_kind': node_kind, 'hierarchy': hierarchy}
+    extra = {key: value for key, value in col_desc.items() if key not in _CATALOG_KEYS}
+    for name, keys, _, coerce in CATALOG_COLUMNS:
+        values[name] = None
+        for key in keys:
+            if key in col_desc:
+                try:
+                    values[name] = coerce(col_desc[key])
+                except _UnfitValue:
+                    extra[key] = col_desc[key]
+    values['extra_col_desc'] = json.dumps(extra) if extra else None
+    return values
+
+# Builds an in-memory Arrow table of the catalog, e.g. for table.to_pandas()
+def attribute_list_to_arrow(attribute_list):
+    import pyarrow as pa
+    schema = catalog_arrow_schema()
+    columns = {name: [] for name in schema.names}
+    for row in attribute_list:
+        for name, value in expand_catalog_row(row).items():
+            columns[name].append(value)
+    return pa.Table.from_pydict(columns, schema=schema)
+
+# Writes flattened rows as typed columns to Parquet (or an Arrow IPC file for
+# .arrow/.feather paths), one row group per row_group_size rows, so Spark and
+# pandas load the catalog without re-parsing a stringified col_desc
+class ColumnarCatalogWriter:
+    def __init__(self, output_path, file_format=None, row_group_size=100000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for Parquet/Arrow output: pip install pyarrow")
+        self.pa = pa
+        self.schema = catalog_arrow_schema()
+        self.file_format = file_format or ('arrow' if output_path.lower().endswith(('.arrow', '.feather')) else 'parquet')
+        if self.file_format == 'parquet':
+            self.batch_writer = pq.ParquetWriter(output_path, self.schema)
+        elif self.file_format == 'arrow':
+            self.batch_writer = pa.ipc.new_file(output_path, self.schema)
+        else:
+            raise ValueError(f"Unsupported catalog format: {self.file_format}")
+        self.row_group_size = row_group_size
+        self.columns = {name: [] for name in self.schema.names}
+        self.pending = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            for name, value in expand_catalog_row(row).items():
+                self.columns[name].append(value)
+            self.pending += 1
+            if self.pending >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if self.pending:
+            table = self.pa.Table.from_pydict(self.columns, schema=self.schema)
+            self.batch_writer.write_table(table)
+            self.columns = {name: [] for name in self.schema.names}
+            self.pending = 0
+
+    def close(self):
+        self._flush()
+        self.batch_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# Picks the catalog writer from the output file extension
+def open_catalog_writer(output_path, row_group_size=100000):
+    if output_path.lower().endswith(('.parquet', '.arrow', '.feather')):
+        return ColumnarCatalogWriter(output_path, row_group_size=row_group_size)
+    return CsvCatalogWriter(output_path)
+
+# Streaming variant of process_hackolade_data for multi-GB exports. Collections
+# are parsed and flattened one at a time and their rows handed to writer as soon
+# as they are done, so memory is bounded by the largest single collection.
+# Rows are ordered by cntr within each collection rather than across the whole
+# model, since the global sort would need every node in memory.
+def stream_hackolade_data(data_file_path, db_nm, writer, db_vendor=None):
+    processor_class = None
+    schema_nm = None
+    seen_collections = set()
+    cntr = 0
+    row_count = 0
+
+    with open(data_file_path, mode='r') as file_in:
+        for key, value in HackoladeStreamReader(file_in).items():
+            if key == 'dbVendor' and db_vendor is None:
+                db_vendor = value
+            if key != 'collections':
+                continue
+
+            if processor_class is None:
+                if db_vendor is None:
+                    db_vendor = peek_db_vendor(data_file_path)
+                print(db_vendor)
+                processor_class = get_processor_class(db_vendor)
+                top_level_dict = {}
+                schema_nm = add_top_level_nodes(top_level_dict, db_nm)
+                writer.write_rows(sort_entity_dict(top_level_dict))
+                row_count += len(top_level_dict)
+
+            cntr += 1
+            collection_dict = {}
+            collection_name = flatten_collection(processor_class, value, schema_nm, cntr, collection_dict)
+            # Duplicate names would need every earlier node kept around to dedupe
+            if collection_name in seen_collections:
+                raise Exception(f"Duplicate collectionName '{collection_name}' is not supported in streaming mode.")
+            seen_collections.add(collection_name)
+
+            writer.write_rows(sort_entity_dict(collection_dict))
+            row_count += len(collection_dict)
+
+    return row_count
+
+_COLUMNAR_EXTENSIONS = ('.parquet', '.arrow', '.feather')
+
+# Loads one side of a diff as {hash: (row, signature)}. source may be an
+# attribute list, a Hackolade export (.json), a CSV catalog written by this
+# module or a columnar catalog. CSV catalogs hold str(col_desc), so rows are
+# compared on that string; columnar catalogs are compared on typed columns.
+def _load_diff_side(source, db_nm, columnar):
+    if isinstance(source, str) and source.lower().endswith(_COLUMNAR_EXTENSIONS):
+        import pyarrow.ipc
+        import pyarrow.parquet as pq
+        if source.lower().endswith('.parquet'):
+            table = pq.read_table(source)
+        else:
+            table = pyarrow.ipc.open_file(source).read_all()
+        nodes = {}
+        for values in table.to_pylist():
+            col_desc = {keys[0]: values[name] for name, keys, _, _ in CATALOG_COLUMNS if values[name] is not None}
+            if values['extra_col_desc']:
+                col_desc.update(json.loads(values['extra_col_desc']))
+            row = [values['hash_key'], values['node_type'], values['node_kind'], values['hierarchy'], col_desc]
+            nodes[values['hash_key']] = (row, values)
+        return nodes
+
+    if isinstance(source, str) and source.lower().endswith('.csv'):
+        nodes = {}
+        with open(source, mode='r', newline='') as file_in:
+            reader = csv.reader(file_in)
+            next(reader, None)
+            for hash_str, node_type, node_kind, hierarchy, col_desc_str in reader:
+                try:
+                    col_desc = ast.literal_eval(col_desc_str)
+                except (ValueError, SyntaxError):
+                    col_desc = col_desc_str
+                row = [hash_str, node_type, node_kind, hierarchy, col_desc]
+                nodes[hash_str] = (row, (node_type, node_kind, hierarchy, col_desc_str))
+        return nodes
+
+    if isinstance(source, str):
+        with open(source, mode='r') as file_in:
+            source = process_hackolade_data(json.load(file_in), db_nm)
+    if columnar:
+        return {row[0]: (row, expand_catalog_row(row)) for row in source}
+    return {row[0]: (row, (row[1], row[2], row[3], str(row[4]))) for row in source}
+
+# Diffs two versions of a model on the md5 hierarchy keys and returns only the
+# nodes that were added, removed or changed, so downstream catalog loads can
+# push deltas instead of reloading the full catalog. old_source may also be a
+# previously written catalog; new_source is an export or attribute list.
+def diff_hackolade_catalogs(old_source, new_source, db_nm='EALDB'):
+    columnar = isinstance(old_source, str) and old_source.lower().endswith(_COLUMNAR_EXTENSIONS)
+    old_nodes = _load_diff_side(old_source, db_nm, columnar)
+    new_nodes = _load_diff_side(new_source, db_nm, columnar)
+
+    diff = {'added': [], 'removed': [], 'changed': []}
+    for hash_str, (row, signature) in new_nodes.items():
+        old_node = old_nodes.get(hash_str)
+        if old_node is None:
+            diff['added'].append(row)
+        elif old_node[1] != signature:
+            diff['changed'].append(row)
+    for hash_str, (row, _) in old_nodes.items():
+        if hash_str not in new_nodes:
+            diff['removed'].append(row)
+    return diff
+
+# Writes a diff as CSV: change_type followed by the usual five catalog columns
+def write_catalog_delta(diff, output_path):
+    with open(output_path, mode='w', newline='') as file_out:
+        csv_writer = csv.writer(file_out)
+        csv_writer.writerow(['change_type', 0, 1, 2, 3, 4])
+        for change_type in ('added', 'changed', 'removed'):
+            for row in diff[change_type]:
+                csv_writer.writerow([change_type] + row)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flatten Hackolade model exports into a schema catalog")
+    parser.add_argument("data_file_path", nargs="?", default=r"/Users/saswatswain/Downloads/Oracle_datatypes_POC.json")
+    parser.add_argument("--output", default=r"output.csv", help="a .parquet/.arrow path writes typed columns")
+    parser.add_argument("--db-name", default='EALDB')
+    parser.add_argument("--stream", action="store_true", help="parse one collection at a time for multi-GB exports")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for flattening collections")
+    parser.add_argument("--diff-against", help="previous export or catalog; writes only added/changed/removed nodes")
+    parser.add_argument("--input-dir", help="flatten every *.json export in this directory")
+    parser.add_argument("--output-dir", default=r"output", help="where --input-dir writes one catalog per export")
+    parser.add_argument("--format", default='csv', choices=['csv', 'parquet', 'arrow'], help="catalog format for --input-dir")
+    parser.add_argument("--cache-dir", help="content-hash cache for --input-dir (default: <output-dir>/.hackolade_cache)")
+    args = parser.parse_args()
+
+    if args.input_dir:
+        summary = process_hackolade_directory(args.input_dir, args.output_dir, args.db_name,
+                                              cache_dir=args.cache_dir, max_workers=args.workers,
+                                              output_format=args.format)
+        print(f"{len(summary['processed'])} exports flattened, {len(summary['skipped'])} unchanged; "
+              f"collection cache {summary['collection_cache_hits']} hits, {summary['collection_cache_misses']} misses")
+    elif args.diff_against:
+        diff = diff_hackolade_catalogs(args.diff_against, args.data_file_path, args.db_name)
+        write_catalog_delta(diff, args.output)
+        print(f"{len(diff['added'])} added, {len(diff['changed'])} changed, {len(diff['removed'])} removed; "
+              f"delta written to {args.output}")
+    elif args.stream:
+        with open_catalog_writer(args.output) as writer:
+            row_count = stream_hackolade_data(args.data_file_path, args.db_name, writer)
+        print(f"{row_count} rows written to {args.output}")
+    else:
+        with open(args.data_file_path, mode='r') as file_in:
+            inp_transform = json.load(file_in)
+
+        if args.workers > 1:
+            attribute_list = process_hackolade_data_parallel(inp_transform, args.db_name, max_workers=args.workers)
+        else:
+            attribute_list = process_hackolade_data(inp_transform, args.db_name)
+
+        for idx, node_list in enumerate(attribute_list):
+            print(idx, node_list)
+
+        if args.output.lower().endswith(('.parquet', '.arrow', '.feather')):
+            with open_catalog_writer(args.output) as writer:
+                writer.write_rows(attribute_list)
+        else:
+            df = pd.DataFrame(attribute_list)
+            df.to_csv(args.output, index=False)
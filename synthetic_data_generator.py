@@ -1,59 +1,196 @@
 pip install pandas langchain groq openai
 
 
+import hashlib
+import json
+import os
+
+import numpy as np
 import pandas as pd
 
 file_path = "input_data.xlsx"  # Change this to your actual file
 
-df = pd.read_csv(file_path) if file_path.endswith('.csv') else pd.read_excel(file_path)
-
-schema = {}
-for col in df.columns:
-    dtype = str(df[col].dtype)
-    unique_values = df[col].nunique()
-    
-    if dtype == 'object':
-        sample_values = df[col].dropna().unique()[:5].tolist()
-        schema[col] = {"type": "categorical", "samples": sample_values}
-    elif dtype in ['int64', 'float64']:
-        schema[col] = {
-            "type": "numeric",
-            "min": df[col].min(),
-            "max": df[col].max(),
-            "mean": df[col].mean(),
-            "std": df[col].std()
-        }
+# Schema analysis is cached by the input file's content hash (same layout as
+# synthetic_data_generator1), so a rerun on an unchanged file skips reading it.
+# Keep schema_version in step with SCHEMA_VERSION there.
+schema_cache_dir = ".schema_cache"
+schema_version = 3
+top_k = 10
+digest = hashlib.sha256()
+with open(file_path, 'rb') as file_in:
+    for block in iter(lambda: file_in.read(1 << 20), b''):
+        digest.update(block)
+cache_path = os.path.join(schema_cache_dir, f"{digest.hexdigest()}-v{schema_version}-k{top_k}.json")
+
+if os.path.exists(cache_path):
+    with open(cache_path) as file_in:
+        schema = json.load(file_in)
+else:
+    df = pd.read_csv(file_path) if file_path.endswith('.csv') else pd.read_excel(file_path)
+
+    schema = {}
+    numeric_cols = [col for col in df.columns if str(df[col].dtype) in ['int64', 'float64']]
+    if numeric_cols:
+        stats = df[numeric_cols].agg(['mean', 'std'])
+        quantiles = df[numeric_cols].quantile([0.05, 0.25, 0.5, 0.75, 0.95])
+
+    for col in df.columns:
+        dtype = str(df[col].dtype)
+
+        if dtype == 'object':
+            freq = df[col].value_counts(normalize=True)
+            schema[col] = {
+                "type": "categorical",
+                "samples": freq.index[:5].tolist(),
+                "unique": int(len(freq)),
+                "top": [[value, round(float(share), 4)] for value, share in freq.head(top_k).items()]
+            }
+        elif dtype in ['int64', 'float64']:
+            schema[col] = {
+                "type": "numeric",
+                "integer": dtype == 'int64',
+                # Per column, so int columns keep int bounds
+                "min": df[col].min().item(),
+                "max": df[col].max().item(),
+                "mean": float(stats.loc['mean', col]),
+                "std": float(stats.loc['std', col]) if pd.notna(stats.loc['std', col]) else 0.0,
+                "quantiles": [float(value) for value in quantiles[col]]
+            }
+
+    os.makedirs(schema_cache_dir, exist_ok=True)
+    # Write to a temp file and rename so an interrupted run leaves no partial cache
+    with open(f"{cache_path}.tmp", 'w') as file_out:
+        json.dump(schema, file_out, default=str)
+    os.replace(f"{cache_path}.tmp", cache_path)
 
 print("Schema Analysis Completed:", schema)
 
 
 
-prompt = "Generate synthetic data with the following schema:\n\n"
+# Compact encoding: quartiles and top category shares instead of raw sample
+# values, rounded to within 1% of each column's spread
+def fmt(value, scale):
+    if not isinstance(value, float):
+        return str(value)
+    decimals = max(0, 2 - int(np.floor(np.log10(scale)))) if scale > 0 else 2
+    return f"{value:.{decimals}f}"
+
+def fmt_share(share):
+    percent = share * 100
+    return f"{percent:.0f}" if percent >= 1 else f"{percent:.1g}"
+
+prompt = "Generate synthetic CSV data. Columns (min..max mean sd q1/median/q3; top values %):\n"
 
 for col, details in schema.items():
     if details["type"] == "categorical":
-        prompt += f"- {col}: One of {details['samples']}\n"
+        top = " ".join(f"{value}:{fmt_share(share)}" for value, share in details["top"][:5])
+        others = details["unique"] - min(5, len(details["top"]))
+        prompt += f"{col} cat {top}" + (f" +{others} more" if others > 0 else "") + "\n"
     elif details["type"] == "numeric":
-        prompt += f"- {col}: A numeric value between {details['min']} and {details['max']} (mean: {details['mean']}, std: {details['std']})\n"
-
-prompt += "\nGenerate 100 rows in CSV format."
-
-print("Generated Prompt:\n", prompt)
-
+        kind = "int" if details["integer"] else "num"
+        scale = details["std"] or float(details["max"] - details["min"])
+        quartiles = "/".join(fmt(value, scale) for value in details["quantiles"][1:4])
+        prompt += (f"{col} {kind} {fmt(details['min'], scale)}..{fmt(details['max'], scale)} "
+                   f"{fmt(details['mean'], scale)} {fmt(details['std'], scale)} {quartiles}\n")
 
+# Rows to generate, rows requested per LLM call, calls in flight and retries
+# per chunk (same pipeline as generate_rows_async in synthetic_data_generator1)
+target_rows = 1000
+chunk_rows = 50
+max_concurrency = 4
+max_retries = 3
+output_path = "synthetic_output.csv"
 
-from langchain.llms import Groq
+# Each chunk appends how many rows it wants (see generate_chunk)
+def row_instruction(num_rows):
+    return f"Generate {num_rows} rows in CSV format. Header: {','.join(schema)}. Output only CSV."
 
-llm = Groq(model="llama3-8b-8192", api_key="YOUR_GROQ_API_KEY")
+print("Generated Prompt:\n", prompt + row_instruction(chunk_rows))
 
-response = llm.invoke(prompt)
 
-print("LLM Response Received")
 
+import asyncio
+import random
+import re
 from io import StringIO
 
-df_synthetic = pd.read_csv(StringIO(response))
-df_synthetic.to_csv("synthetic_output.csv", index=False)
+# Set SYNTHETIC_STUB_LLM=1 to answer prompts with random rows from the schema, without network access
+if os.environ.get("SYNTHETIC_STUB_LLM") == "1":
+    class StubLLM:
+        async def ainvoke(self, chunk_prompt):
+            num_rows = int(re.search(r"Generate (\d+) rows", chunk_prompt).group(1))
+            data = {}
+            for col, details in schema.items():
+                if details["type"] == "categorical":
+                    values, shares = zip(*details["top"])
+                    data[col] = np.random.choice(list(values), num_rows, p=np.array(shares) / sum(shares))
+                else:
+                    data[col] = np.clip(np.random.normal(details["mean"], details["std"], num_rows),
+                                        details["min"], details["max"])
+            return pd.DataFrame(data).to_csv(index=False)
+
+    llm = StubLLM()
+else:
+    from langchain.llms import Groq
+
+    llm = Groq(model="llama3-8b-8192", api_key="YOUR_GROQ_API_KEY")
+
+# Keeps the schema's columns and drops rows whose numeric fields are not
+# numbers; raises ValueError when nothing usable came back so the chunk is retried
+def parse_chunk(text):
+    chunk_df = pd.read_csv(StringIO(re.sub(r"^```[a-zA-Z]*\s*|```\s*$", "", text.strip())))
+    chunk_df.columns = [str(col).strip() for col in chunk_df.columns]
+    missing = [col for col in schema if col not in chunk_df.columns]
+    if missing:
+        raise ValueError(f"LLM output is missing columns: {missing}")
+    chunk_df = chunk_df[list(schema)]
+    for col, details in schema.items():
+        if details["type"] == "numeric":
+            values = pd.to_numeric(chunk_df[col], errors="coerce")
+            chunk_df = chunk_df[values.notna() | chunk_df[col].isna()].assign(**{col: values})
+    if chunk_df.empty:
+        raise ValueError("LLM output has no valid rows")
+    return chunk_df
+
+async def generate_chunk(num_rows, semaphore):
+    chunk_prompt = prompt + row_instruction(num_rows)
+    for attempt in range(max_retries + 1):
+        try:
+            async with semaphore:
+                response = await llm.ainvoke(chunk_prompt)
+            return parse_chunk(response).head(num_rows)
+        except Exception as exc:
+            if attempt == max_retries:
+                print(f"Chunk of {num_rows} rows failed after {max_retries + 1} attempts: {exc}")
+                return None
+            # Exponential backoff with jitter so retries don't arrive in lockstep
+            await asyncio.sleep(2 ** attempt * (0.5 + random.random()))
+
+# Chunks run concurrently and each one's rows are appended to the output as it
+# arrives; short or failed chunks are topped up in a few more rounds
+async def generate_rows():
+    semaphore = asyncio.Semaphore(max_concurrency)
+    generated = 0
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    for _ in range(3):
+        remaining = target_rows - generated
+        if remaining <= 0:
+            break
+        sizes = [min(chunk_rows, remaining - start) for start in range(0, remaining, chunk_rows)]
+        for task in asyncio.as_completed([generate_chunk(size, semaphore) for size in sizes]):
+            chunk_df = await task
+            if chunk_df is None:
+                continue
+            chunk_df = chunk_df.head(target_rows - generated)
+            if chunk_df.empty:
+                continue
+            chunk_df.to_csv(output_path, mode="a", header=not generated, index=False)
+            generated += len(chunk_df)
+    return generated
+
+generated = asyncio.run(generate_rows())
+print(f"{generated} of {target_rows} rows saved to {output_path}")
 
 print("Synthetic data generated and saved successfully!")
 